@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import numpy as np
+import pandas as pd
+from finanzas import Finanzas
+
+HEADER = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+          'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+GETTERS = ['summary', 'get_month_with_more_expenses', 'get_month_with_more_savings',
+           'get_year_expenses_mean', 'get_year_expenses', 'get_year_incomes']
+SEPARATOR_NAMES = {'\t': 'tab', ',': 'comma', ';': 'semicolon', '|': 'pipe'}
+
+
+def generate_ledger(file, rows, separator='\t', seed=0, nan_rate=0.0, comma_rate=0.0):
+    # Genera un fichero con el mismo formato que finanzas2020.csv: enteros entre -1000 y 1000.
+    # Con nan_rate se deja vacía esa fracción de celdas y con comma_rate esa fracción se escribe
+    # como decimal con coma ("12,34", entre comillas si el separador es la coma).
+    rng = np.random.default_rng(seed)
+    quote = '"' if separator == ',' else ''
+    with open(file, 'w', encoding='UTF8') as f:
+        f.write(separator.join(HEADER) + '\n')
+        # Por bloques para no tener el fichero entero en memoria
+        for start in range(0, rows, 100000):
+            n = min(100000, rows - start)
+            cells = rng.integers(-1000, 1001, size=(n, 12)).astype(str).astype(object)
+            draw = rng.random((n, 12))
+            commas = draw < comma_rate
+            cents = rng.integers(0, 100, size=int(commas.sum()))
+            cells[commas] = [f'{quote}{cell},{cent:02d}{quote}' for cell, cent in zip(cells[commas], cents)]
+            cells[(draw >= comma_rate) & (draw < comma_rate + nan_rate)] = ''
+            f.write(''.join(separator.join(row) + '\n' for row in cells.tolist()))
+    return file
+
+
+def _best_time(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _max_rss():
+    # Pico de memoria residente (RSS) del proceso en bytes. En Linux se lee VmHWM, que empieza de cero en cada
+    # proceso nuevo: ru_maxrss conserva a través de fork y exec el pico del proceso que lo ha lanzado
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _rss_increase(file, separator, engine, chunksize):
+    # Se ejecuta en un proceso nuevo: cuánto sube el pico de RSS del proceso al cargar el fichero, sobre lo
+    # que ya ocupaba tras importar pandas y finanzas. A diferencia de tracemalloc incluye las reservas del
+    # parser en C de pandas y los buffers de NumPy (y, con mmap, las páginas del fichero proyectado)
+    antes = _max_rss()
+    _engines(file, separator, chunksize)[engine]()
+    return _max_rss() - antes
+
+
+def _peak_rss(file, separator, engine, chunksize):
+    # Una ejecución aparte de las cronometradas, en un proceso sin las reservas de las anteriores. None donde
+    # no existe el módulo resource (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(_rss_increase, file, separator, engine, chunksize).result()
+
+
+def _load_cells(file, separator):
+    # Referencia: la conversión celda a celda (Finanzas.__convert_2_numeric_type) del fichero entero
+    fin = Finanzas()
+    convert = fin._Finanzas__convert_2_numeric_type
+    df = pd.read_csv(file, delimiter=separator)
+    for col_index, col in enumerate(df):
+        valores = [convert(dato) for dato in df[col]]
+        fin._gastos[col_index] += sum(valor for valor in valores if valor < 0)
+        fin._ingresos[col_index] += sum(valor for valor in valores if valor >= 0)
+    return fin
+
+
+def _engines(file, separator, chunksize=50000):
+    # Una función sin argumentos por motor de lectura, que carga el fichero con ese motor. 'chunked' es
+    # process_file por bloques de chunksize filas y 'cells' la conversión celda a celda, como referencia
+    return {'pandas': lambda: Finanzas().process_file(file, separator),
+            'chunked': lambda: Finanzas().process_file(file, separator, chunksize=chunksize),
+            'mmap': lambda: Finanzas().process_file_mmap(file, separator),
+            'cells': lambda: _load_cells(file, separator)}
+
+
+def bench_getters(fin, repeat=3):
+    # Cada getter se mide en frío (sin el resumen cacheado, sobre una copia recién creada) y en caliente
+    results = {}
+    for name in GETTERS:
+        cold = float('inf')
+        for _ in range(repeat):
+            copy = Finanzas.from_bytes(fin.to_bytes())
+            start = time.perf_counter()
+            getattr(copy, name)()
+            cold = min(cold, time.perf_counter() - start)
+        results[name] = {'cold_seconds': cold,
+                         'warm_seconds': _best_time(getattr(fin, name), repeat)}
+    return results
+
+
+def bench_case(rows, separator, repeat=3, seed=0, nan_rate=0.0, comma_rate=0.0, engines=('pandas', 'mmap'),
+               chunksize=50000):
+    # Genera un fichero, lo mide con cada motor y con los getters y lo borra
+    file = generate_ledger(f'benchmark_ledger_{os.getpid()}.csv', rows, separator, seed, nan_rate, comma_rate)
+    runs = _engines(file, separator, chunksize)
+    try:
+        case = {'rows': rows, 'separator': SEPARATOR_NAMES.get(separator, separator),
+                'nan_rate': nan_rate, 'comma_rate': comma_rate,
+                'file_bytes': os.path.getsize(file), 'engines': {}}
+        for name in engines:
+            seconds = _best_time(runs[name], repeat)
+            case['engines'][name] = {'seconds': seconds,
+                                     'rows_per_second': rows / seconds if seconds else None,
+                                     'peak_rss_increase_bytes': _peak_rss(file, separator, name, chunksize)}
+        case['getters'] = bench_getters(Finanzas().process_file(file, separator), repeat)
+        return case
+    finally:
+        os.remove(file)
+
+
+def run_suite(sizes, separators, repeat=3, seed=0, nan_rate=0.0, comma_rate=0.0, engines=('pandas', 'mmap'),
+              chunksize=50000):
+    # Todas las combinaciones de tamaño y separador, con los datos del entorno para poder comparar
+    # resultados de distintas versiones
+    return {'environment': {'python': sys.version.split()[0], 'numpy': np.__version__,
+                            'pandas': pd.__version__, 'platform': platform.platform(),
+                            'processor': platform.processor() or platform.machine()},
+            'parameters': {'repeat': repeat, 'seed': seed, 'nan_rate': nan_rate, 'comma_rate': comma_rate,
+                           'chunksize': chunksize},
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'cases': [bench_case(rows, separator, repeat, seed, nan_rate, comma_rate, engines, chunksize)
+                      for rows in sizes for separator in separators]}
+
+
+def _print_case(case):
+    print(f"{case['rows']:>10,} filas  sep={case['separator']:<9} nan={case['nan_rate']:.2f} "
+          f"coma={case['comma_rate']:.2f}")
+    for name, result in case['engines'].items():
+        rss = result['peak_rss_increase_bytes']
+        rss = 'n/d' if rss is None else f"+{rss / 2 ** 20:.1f} MiB"
+        print(f"    {name:>8}: {result['seconds']:.3f} s ({result['rows_per_second']:,.0f} filas/s, "
+              f"pico de RSS {rss})")
+    for name, result in case['getters'].items():
+        print(f"    {name:>30}: {result['cold_seconds'] * 1e6:8.1f} us en frío, "
+              f"{result['warm_seconds'] * 1e6:8.1f} us en caliente")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de la lectura y los getters de Finanzas.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--separators', nargs='+', default=['\t', ','],
+                        help="Separadores a probar ('tab' equivale a '\\t').")
+    parser.add_argument('--nan-rate', type=float, default=0.0)
+    parser.add_argument('--comma-rate', type=float, default=0.0)
+    parser.add_argument('--engines', nargs='+', choices=['pandas', 'chunked', 'mmap', 'cells'],
+                        default=['pandas', 'mmap'])
+    parser.add_argument('--chunksize', type=int, default=50000, help="Filas por bloque del motor 'chunked'.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    separators = ['\t' if sep == 'tab' else sep for sep in args.separators]
+    results = run_suite(args.sizes, separators, args.repeat, args.seed, args.nan_rate, args.comma_rate,
+                        args.engines, args.chunksize)
+    for case in results['cases']:
+        _print_case(case)
+    if args.output:
+        with open(args.output, 'w', encoding='UTF8') as f:
+            json.dump(results, f, indent=2)
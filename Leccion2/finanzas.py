@@ -1,21 +1,367 @@
+import glob
+import io
+import itertools
 import math
-import re
-import pandas as pd
-from matplotlib import pyplot as ptl
+import mmap
+import numbers
+import os
+import time
+from array import array
+# numpy, pandas, matplotlib, asyncio y el pool de procesos se importan dentro de las funciones que los
+# usan: importar este módulo (p.ej. para usar los getters sobre totales cacheados) no los carga.
+
+# Cadenas que int() acepta tras sustituir la coma decimal por punto: signo opcional, dígitos (con guiones
+# bajos entre ellos) y espacios alrededor. Cualquier decimal falla. Como int(), \d y \s aceptan también los
+# dígitos y espacios Unicode ("٣")
+_PATRON_ENTERO = r'\s*[+-]?\d+(?:_\d+)*\s*'
+# Longitud máxima de las celdas que se convierten con el array de caracteres de NumPy (_plain_integers): el
+# array ocupa filas x la celda más larga, así que una sola celda muy larga no debe fijar su anchura
+_CELDA_CORTA = 20
+
+
+def _truncate(numeros):
+    # int(float) trunca hacia cero; los infinitos no se pueden convertir y cuentan como 0
+    import numpy as np
+    numeros = numeros.to_numpy(dtype=np.float64)
+    return np.trunc(np.where(np.isfinite(numeros), numeros, 0)).astype(np.int64)
+
+
+def _decimal_notation(textos):
+    # Celdas con punto o exponente ("5.0", "1e3"): pd.to_numeric las lee como enteros, pero int() no
+    import numpy as np
+    return textos.str.contains('[.eE]').to_numpy(dtype=bool)
+
+
+def _plain_integers(textos, longitudes):
+    # Celdas que son sólo dígitos ASCII con un signo delante opcional ("-120"), el caso habitual de un fichero
+    # de importes. Devuelve su máscara y sus valores, calculados con los códigos de los caracteres columna a
+    # columna (con hasta 18 cifras caben en int64). longitudes son las de las cadenas originales: el array
+    # 'U' pierde los caracteres nulos del final ("5\x00"). Los dígitos Unicode no cuentan como simples y
+    # siguen el camino de _PATRON_ENTERO
+    import numpy as np
+    if not len(textos):
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    codigos = textos.view(np.uint32).reshape(len(textos), -1)
+    digitos = (codigos >= ord('0')) & (codigos <= ord('9'))
+    ocupados = codigos != 0
+    validos = digitos | ~ocupados
+    negativos = codigos[:, 0] == ord('-')
+    validos[:, 0] |= negativos | (codigos[:, 0] == ord('+'))
+    cifras = np.count_nonzero(digitos, axis=1)
+    simples = (validos.all(axis=1) & (np.count_nonzero(ocupados, axis=1) == longitudes)
+               & (cifras > 0) & (cifras <= 18))
+    valores = np.zeros(len(textos), dtype=np.int64)
+    for posicion in range(codigos.shape[1]):
+        valores = np.where(digitos[:, posicion], valores * 10 + (codigos[:, posicion] - ord('0')), valores)
+    return simples, np.where(negativos, -valores, valores)
+
+
+def _text_values(textos):
+    # Rama de texto de __convert_2_numeric_type: int(str(dato).replace(',', '.')) o 0 si falla.
+    # Devuelve los valores y la máscara de celdas con texto que no es un entero (ValueError y 0).
+    # Los enteros simples de las celdas cortas se convierten con NumPy; pd.to_numeric (en C) descarta la
+    # mayoría del resto (decimales), y el patrón de int(), que se evalúa celda a celda, sólo se aplica a las
+    # que quedan (" 7", "1_000", "٣", enteros largos...)
+    import numpy as np
+    import pandas as pd
+    presentes = textos.notna().to_numpy(dtype=bool)
+    valores = np.zeros(len(textos), dtype=np.int64)
+    enteros = np.zeros(len(textos), dtype=bool)
+    if not presentes.any():
+        return valores, enteros
+    posiciones = np.flatnonzero(presentes)
+    objetos = textos.to_numpy(dtype=object)[presentes]
+    longitudes = np.fromiter(map(len, objetos), dtype=np.int64, count=len(objetos))
+    cortas = longitudes <= _CELDA_CORTA
+    simples, numeros = _plain_integers(np.asarray(objetos[cortas], dtype=str), longitudes[cortas])
+    valores[posiciones[cortas][simples]] = numeros[simples]
+    enteros[posiciones[cortas][simples]] = True
+    if simples.all() and cortas.all():
+        return valores, presentes & ~enteros
+
+    resto = np.concatenate([posiciones[cortas][~simples], posiciones[~cortas]])
+    resto.sort()
+    otros = textos.iloc[resto]
+    # pd.to_numeric sólo descarta celdas: las que lee como decimales, infinitos o con punto o exponente no
+    # pueden ser enteros para int(). Su valor no se usa, porque con muchas cifras no es exacto
+    # ("0...017" da 0.0); el de las que cumplen el patrón lo da int()
+    numeros = pd.to_numeric(otros, errors='coerce').to_numpy(dtype=np.float64)
+    candidatos = np.isnan(numeros) | (np.isfinite(numeros) & (numeros == np.trunc(numeros)))
+    leidos = candidatos & ~np.isnan(numeros)
+    if leidos.any():
+        candidatos[leidos] = ~_decimal_notation(otros[leidos])
+    if candidatos.any():
+        dudosos = otros[candidatos]
+        es_entero = dudosos.str.fullmatch(_PATRON_ENTERO).eq(True).to_numpy(dtype=bool)
+        if es_entero.any():
+            # Son pocas celdas: int() da exactamente el valor (y OverflowError si no cabe en int64)
+            valores[resto[candidatos][es_entero]] = np.array([int(dudoso) for dudoso in dudosos[es_entero]],
+                                                             dtype=np.int64)
+            enteros[resto[candidatos][es_entero]] = True
+    return valores, presentes & ~enteros
+
+
+def _coerce_text(textos, metrics=None):
+    import numpy as np
+    valores, ceros = _text_values(textos)
+    if metrics is not None:
+        # Celdas con texto que no es un entero: en la versión por celda, ValueError y 0
+        metrics.count('fallback_zero', int(np.count_nonzero(ceros)))
+    return valores
+
+
+def _coerce_column(columna, metrics=None):
+    # Versión vectorizada de Finanzas.__convert_2_numeric_type para una columna completa.
+    # Devuelve un array int64 con los mismos valores que daría la conversión celda a celda.
+    import numpy as np
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(columna):
+        # type(True).__name__ es 'bool': int('True') falla y el valor se queda en 0
+        if metrics is not None:
+            metrics.count('fallback_zero', int(columna.notna().sum()))
+        return np.zeros(len(columna), dtype=np.int64)
+    if pd.api.types.is_integer_dtype(columna):
+        return columna.fillna(0).to_numpy(dtype=np.int64)
+    if pd.api.types.is_float_dtype(columna):
+        # int(float) trunca hacia cero y los NaN cuentan como 0
+        return _truncate(columna.fillna(0))
+    if isinstance(columna.dtype, pd.StringDtype) or pd.api.types.infer_dtype(columna, skipna=True) == 'string':
+        # Caso habitual de read_csv: cadenas y huecos (NaN), que no cumplen el patrón y valen 0
+        return _coerce_text(columna, metrics)
+
+    # Columna object mezclada: sólo los int/float de Python siguen la rama numérica,
+    # el resto (bool, tipos de numpy...) se convierten a texto igual que en la versión por celda
+    valores = np.zeros(len(columna), dtype=np.int64)
+    es_numero = columna.map(type).isin([int, float]).to_numpy(dtype=bool)
+    if es_numero.any():
+        numeros = pd.to_numeric(columna[es_numero]).fillna(0)
+        valores[es_numero] = _truncate(numeros)
+    if not es_numero.all():
+        valores[~es_numero] = _coerce_text(columna[~es_numero].astype(str), metrics)
+    return valores
+
+
+class _TypedTotals():
+    # Totales de un fichero leído por bloques. pandas infiere el tipo de cada columna en cada bloque, y al
+    # leer el fichero entero una columna con algún texto es de texto (sus decimales valen 0) y una columna
+    # sólo con números es numérica (sus decimales se truncan). Como finanzas_mmap.scan, se suman por separado
+    # las dos interpretaciones de cada columna; el tipo se decide al final, con todas las filas, así que el
+    # resultado no depende del tamaño de bloque. Los bloques se leen con la inferencia de tipos de pandas:
+    # en un bloque numérico la interpretación como texto sólo se calcula si no hace falta el texto original,
+    # y si la columna acaba siendo de texto se vuelve a leer como texto (add_text).
+    __slots__ = ('numeric', 'text', 'is_text', 'missing', 'fallback', 'nrows', 'blocks', 'rescan')
+
+    def __init__(self, retain_rows=False):
+        import numpy as np
+        # [0] gastos y [1] ingresos de cada columna si resulta numérica y si resulta de texto
+        self.numeric = np.zeros((2, 12), dtype=np.int64)
+        self.text = np.zeros((2, 12), dtype=np.int64)
+        self.is_text = np.zeros(12, dtype=bool)
+        # Columnas con algún bloque del que falta la interpretación como texto (text no está completo)
+        self.missing = np.zeros(12, dtype=bool)
+        # Celdas que valen 0 en una columna de texto porque int() daría ValueError
+        self.fallback = np.zeros(12, dtype=np.int64)
+        self.nrows = 0
+        # Con retain_rows, los valores de cada bloque (n x 12) en las dos interpretaciones
+        self.blocks = [] if retain_rows else None
+        self.rescan = None
+
+    def __add_totals(self, totals, col_index, valores):
+        gastos = int(valores[valores < 0].sum())
+        totals[0, col_index] += gastos
+        totals[1, col_index] += int(valores.sum()) - gastos
+
+    def __interpret(self, col_index, columna):
+        # Valores de una columna del bloque como número y como texto (None si hace falta el texto original)
+        import numpy as np
+        import pandas as pd
+        if pd.api.types.is_bool_dtype(columna) or (columna.dtype == object and
+                                                   pd.api.types.infer_dtype(columna) == 'boolean'):
+            # True/False, con o sin huecos: int('True') falla, así que valen 0 y la columna es de texto
+            presentes = int(columna.notna().sum())
+            self.is_text[col_index] |= presentes > 0
+            self.fallback[col_index] += presentes
+            ceros = np.zeros(len(columna), dtype=np.int64)
+            return ceros, ceros
+        if pd.api.types.is_signed_integer_dtype(columna):
+            # Los enteros valen lo mismo como número y como texto
+            valores = columna.to_numpy(dtype=np.int64)
+            return valores, valores
+        if pd.api.types.is_float_dtype(columna):
+            numeros = columna.to_numpy(dtype=np.float64)
+            if not (np.isfinite(numeros) & (numeros == np.trunc(numeros))).any():
+                # Sólo decimales, infinitos y huecos: como texto todos valen 0
+                self.fallback[col_index] += int(np.count_nonzero(~np.isnan(numeros)))
+                return _truncate(columna), np.zeros(len(columna), dtype=np.int64)
+            # Un entero escrito como "5" y como "5.0" da el mismo float, pero int() sólo acepta el primero
+            self.missing[col_index] = True
+            return _truncate(columna), None
+        if pd.api.types.is_numeric_dtype(columna):
+            # Enteros que no caben en int64 (uint64)
+            self.missing[col_index] = True
+            return _coerce_column(columna), None
+        if not (isinstance(columna.dtype, pd.StringDtype) or
+                pd.api.types.infer_dtype(columna, skipna=True) in ('string', 'empty')):
+            # Columna object mezclada: con low_memory, pandas lee un bloque grande en varios trozos con su
+            # propia inferencia y junta floats de unos y cadenas de otros. Como en _coerce_column, los números
+            # de Python siguen la rama numérica y el resto pasa a texto; el texto original de los números se
+            # ha perdido, así que si la columna es de texto se vuelve a leer (add_text)
+            es_numero = columna.map(type).isin([int, float]).to_numpy(dtype=bool)
+            self.is_text[col_index] |= bool((columna.notna().to_numpy(dtype=bool) & ~es_numero).any())
+            self.missing[col_index] = True
+            return _coerce_column(columna), None
+        # Columna de texto: pandas conserva las cadenas de las celdas
+        text, ceros = _text_values(columna)
+        self.is_text[col_index] |= bool(columna.notna().any())
+        self.fallback[col_index] += int(np.count_nonzero(ceros))
+        return text, text
+
+    def add(self, df):
+        # df es un bloque leído con la inferencia de tipos de pandas (o como texto las columnas que ya se sabe
+        # que son de texto)
+        import numpy as np
+        numeric_columns, text_columns = [], []
+        for col_index, col in enumerate(df):
+            numeric, text = self.__interpret(col_index, df[col])
+            self.__add_totals(self.numeric, col_index, numeric)
+            if text is None:
+                # Se rellena en add_text si la columna resulta ser de texto
+                text = np.zeros(len(df), dtype=np.int64)
+            else:
+                self.__add_totals(self.text, col_index, text)
+            numeric_columns.append(numeric)
+            text_columns.append(text)
+        self.nrows += len(df)
+        if self.blocks is not None and numeric_columns:
+            self.blocks.append((np.column_stack(numeric_columns), np.column_stack(text_columns)))
+
+    def pending(self):
+        # Columnas de texto a las que les falta la interpretación como texto de algún bloque
+        import numpy as np
+        return np.flatnonzero(self.is_text & self.missing).tolist()
+
+    def reset_text(self, col_indexes):
+        # Antes de volver a leer como texto las columnas col_indexes de las nrows filas ya sumadas
+        self.text[:, col_indexes] = 0
+        self.fallback[col_indexes] = 0
+        if self.blocks is not None:
+            self.rescan = []
+
+    def add_text(self, col_indexes, df):
+        # df es un bloque de esas filas con las columnas col_indexes leídas como texto
+        import numpy as np
+        columnas = []
+        for col_index, col in zip(col_indexes, df):
+            text, ceros = _text_values(df[col])
+            self.fallback[col_index] += int(np.count_nonzero(ceros))
+            self.__add_totals(self.text, col_index, text)
+            columnas.append(text)
+        if self.rescan is not None and columnas:
+            self.rescan.append(np.column_stack(columnas))
+
+    def finish_text(self, col_indexes):
+        import numpy as np
+        self.missing[col_indexes] = False
+        if self.blocks is not None:
+            # Los bloques de la relectura no coinciden con los guardados: se reparten las filas por posición
+            textos = np.concatenate(self.rescan) if self.rescan else np.zeros((0, len(col_indexes)), np.int64)
+            inicio = 0
+            for numeric, text in self.blocks:
+                text[:, col_indexes] = textos[inicio:inicio + len(text)]
+                inicio += len(text)
+            self.rescan = None
+
+    def totals(self):
+        # Gastos e ingresos de cada mes según el tipo final de cada columna
+        import numpy as np
+        gastos = np.where(self.is_text, self.text[0], self.numeric[0])
+        ingresos = np.where(self.is_text, self.text[1], self.numeric[1])
+        return gastos.tolist(), ingresos.tolist()
+
+    def fallback_zero(self):
+        return int(self.fallback[self.is_text].sum())
+
+    def rows(self):
+        import numpy as np
+        if not self.blocks:
+            return np.zeros((0, 12), dtype=np.int64)
+        return np.concatenate([np.where(self.is_text, text, numeric) for numeric, text in self.blocks])
+
+
+class _NoTimer():
+    # Cronómetro que no mide nada: es lo que usa Finanzas sin métricas, sin coste apreciable
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def _validate_header(columns):
+    # Si el número de columnas no es 12 el fichero no tiene el formato esperado
+    if len(columns) != 12:
+        raise InvalidNumberOfColumns(f"Invalid number of columns. Expected 12 found {len(columns)}.")
+
+    # Si el nombre de la columna no es correcto o no están en el orden indicado
+    for i in range(0,12):
+        if columns[i].lower() != Finanzas._months[i]:
+            raise InvalidColumnNameOrOrder('''Column name or column order is not correct.\n
+                                            Check the column order and if the months are correctly
+                                            localized in spanish (es_ES)''')
+
+
+def _month_position(month):
+    # Acepta el nombre del mes en español (sin distinguir mayúsculas) o su posición de 0 a 11
+    if isinstance(month, str):
+        if month.lower() not in Finanzas._months:
+            raise ValueError(f"Unknown month {month}. Expected a month localized in spanish (es_ES).")
+        return Finanzas._months.index(month.lower())
+    # Sólo posiciones enteras: 1.5 o True no son meses (y los slices de los totales los aceptarían sin avisar)
+    if isinstance(month, bool) or not isinstance(month, numbers.Integral):
+        raise ValueError(f"Invalid month {month!r}. Expected a month name or an index from 0 to 11.")
+    if not 0 <= month < 12:
+        raise ValueError(f"Month index {month} out of range. Expected 0 to 11.")
+    return int(month)
+
+
+def _month_range(first_month, last_month):
+    # Posiciones de un rango de meses; el primero no puede ir después del último
+    first, last = _month_position(first_month), _month_position(last_month)
+    if first > last:
+        raise ValueError(f"Invalid month range {first_month} to {last_month}. "
+                         f"The first month must not come after the last one.")
+    return first, last
 
 
 class Finanzas():
-    _data_processed = False
-    _gastos = list()
-    _ingresos = list()
-    _months = ['enero', 'febrero', 'marzo', 'abril',
-                      'mayo', 'junio', 'julio', 'agosto',
-                      'septiembre', 'octubre', 'noviembre', 'diciembre']
+    # Sin __dict__: cada instancia guarda sólo su estado, y los totales mensuales van en arrays de
+    # enteros de 64 bits (12 huecos de 8 bytes) en lugar de listas de objetos int
+    __slots__ = ('_data_processed', '_gastos', '_ingresos', '_summary', '_offsets', '_rows', '_row_index',
+                 '_metrics')
+    _months = ('enero', 'febrero', 'marzo', 'abril',
+               'mayo', 'junio', 'julio', 'agosto',
+               'septiembre', 'octubre', 'noviembre', 'diciembre')
 
 
-    def __init__(self):
-        self._gastos = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        self._ingresos = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    def __init__(self, retain_rows=False, metrics=None):
+        self._data_processed = False
+        self._gastos = array('q', bytes(8 * 12))
+        self._ingresos = array('q', bytes(8 * 12))
+        # Estadísticas calculadas por summary(); se invalidan cada vez que entran datos nuevos
+        self._summary = None
+        # Estado de cada fichero de process_file_incremental(): {ruta absoluta: (offset, _TypedTotals)}
+        self._offsets = None
+        # Con retain_rows=True se guardan además los valores de cada fila (bloques int64 de n x 12) para las
+        # consultas por fila; _row_index son las sumas acumuladas que se calculan al primer uso
+        self._rows = [] if retain_rows else None
+        self._row_index = None
+        # Instrumentación opcional (finanzas_metrics.MetricsFinanzas): tiempos por etapa y contadores
+        self._metrics = metrics
         string_viejo = str("1,1'").replace(",\"", "a")
 
 
@@ -53,44 +399,193 @@ class Finanzas():
                 return 0
             return 0'''''
 
-    def process_file(self, file, separator):
-        try:
-            df = pd.read_csv(file, delimiter=separator)
-
+    def __accumulate(self, df):
+        self._summary = None
+        col_index = 0
+        columnas = []
+        for col in df:
             # Si la columna está vacía la desechamos y continuamos con la siguiente columna
-            if df.shape[1] != 12:
-                raise InvalidNumberOfColumns(f"Invalid number of columns. Expected 12 found {df.shape[1]}.")
-
-            # Si el nombre de la columna no es correcto o no están en el orden indicado
-            for i in range(0,12):
-                if df.columns[i].lower() != self._months[i]:
-                    raise InvalidColumnNameOrOrder('''Column name or column order is not correct.\n
-                                                    Check the column order and if the months are correctly
-                                                    localized in spanish (es_ES)''')
-
-            col_index = 0
-            for col in df:
-                # Si la columna está vacía la desechamos y continuamos con la siguiente columna
-
-                try:
-                    if df[col].empty:
-                        raise ColumnIsEmpty(f"Column {col} has no values. It will be not considered on the mean computation")
-                except ColumnIsEmpty as e:
-                    col_index += 1
-                    df.drop(col)
-                    continue
-
-                row_count = 0
-                for data in df[col]:
-                    row_count += 1
-                    dat = self.__convert_2_numeric_type(data)
-                    if dat < int(0):
-                        self._gastos[col_index] += dat
-                    elif dat >= int(0):
-                        self._ingresos[col_index] += dat
-                    else:
-                        print(f"Ignoring value {data} at row {row_count} for column {col}...")
+            try:
+                if df[col].empty:
+                    raise ColumnIsEmpty(f"Column {col} has no values. It will be not considered on the mean computation")
+            except ColumnIsEmpty as e:
                 col_index += 1
+                continue
+
+            # Convertimos la columna entera de una vez y separamos gastos e ingresos con máscaras
+            with self.__stage('coerce'):
+                valores = _coerce_column(df[col], self._metrics)
+            with self.__stage('accumulate'):
+                self.__accumulate_values(col_index, valores)
+            columnas.append(valores)
+            col_index += 1
+        if columnas:
+            self.__retain_rows(columnas)
+        if self._metrics is not None:
+            self._metrics.count('rows', len(df))
+            self._metrics.count('cells', len(df) * len(columnas))
+
+    def __accumulate_values(self, col_index, valores):
+        self._gastos[col_index] += int(valores[valores < 0].sum())
+        self._ingresos[col_index] += int(valores[valores >= 0].sum())
+
+    def __stage(self, name):
+        return _NO_TIMER if self._metrics is None else self._metrics.stage(name)
+
+    def __retain_rows(self, columnas):
+        import numpy as np
+        if self._rows is not None:
+            self._rows.append(np.column_stack([np.asarray(valores, dtype=np.int64) for valores in columnas]))
+            self._row_index = None
+
+    def __drop_rows(self):
+        # Datos que llegan sin filas (mmap, merge con totales): las consultas por fila dejan de ser válidas
+        if self._rows is not None:
+            self._rows = None
+            self._row_index = None
+
+    def __accumulate_typed(self, tipos, before=None):
+        # Suma a los totales los de un fichero leído por bloques, con el tipo de cada columna ya decidido.
+        # before son los totales y celdas a 0 que ya se habían sumado de ese fichero (process_file_incremental):
+        # se restan, porque una fila nueva puede cambiar el tipo de una columna y con él las filas anteriores
+        self._summary = None
+        gastos_antes, ingresos_antes, fallback_antes = before or ([0] * 12, [0] * 12, 0)
+        with self.__stage('accumulate'):
+            gastos, ingresos = tipos.totals()
+            for i in range(0, 12):
+                self._gastos[i] += gastos[i] - gastos_antes[i]
+                self._ingresos[i] += ingresos[i] - ingresos_antes[i]
+        if self._metrics is not None:
+            self._metrics.count('fallback_zero', tipos.fallback_zero() - fallback_antes)
+
+    def __read_typed(self, tipos, rows, separator, chunksize, header):
+        # Lee las filas de rows por bloques de chunksize filas (todas de una vez con None) con la inferencia de
+        # tipos de pandas y las suma a tipos. Las columnas que ya se sabe que son de texto se leen como texto
+        import pandas as pd
+        dtype = {self._months[i]: str for i in range(0, 12) if tipos.is_text[i]}
+        with pd.read_csv(rows, delimiter=separator, header=header, names=self._months, dtype=dtype or None,
+                         iterator=True, chunksize=chunksize) as reader:
+            while True:
+                with self.__stage('read_csv'):
+                    df = next(reader, None)
+                if df is None:
+                    break
+                with self.__stage('coerce'):
+                    tipos.add(df)
+                if self._metrics is not None:
+                    self._metrics.count('rows', len(df))
+                    self._metrics.count('cells', len(df) * len(df.columns))
+
+    def __rescan_text(self, tipos, rows, separator, chunksize, header):
+        # Si una columna ha resultado ser de texto después de leer bloques numéricos, se vuelven a leer como
+        # texto sólo esas columnas de las filas ya sumadas para completar su interpretación como texto
+        import pandas as pd
+        col_indexes = tipos.pending()
+        if not col_indexes:
+            return
+        tipos.reset_text(col_indexes)
+        with pd.read_csv(rows, delimiter=separator, header=header, names=self._months,
+                         usecols=[self._months[i] for i in col_indexes], dtype=str, nrows=tipos.nrows,
+                         iterator=True, chunksize=chunksize) as reader:
+            while True:
+                with self.__stage('read_csv'):
+                    df = next(reader, None)
+                if df is None:
+                    break
+                with self.__stage('coerce'):
+                    tipos.add_text(col_indexes, df)
+        tipos.finish_text(col_indexes)
+
+    def process_file(self, file, separator, chunksize=None):
+        # Con chunksize=None se carga el fichero entero. Con un chunksize (número de filas) el fichero se
+        # lee por bloques y se acumula bloque a bloque, de modo que la memoria no depende del tamaño del
+        # fichero. El tipo de cada columna se decide con todos los bloques (ver _TypedTotals), así que el
+        # resultado no depende del tamaño de bloque y es el mismo que al cargar el fichero entero, salvo en un
+        # caso: al cargarlo entero, pandas (low_memory) lee los ficheros grandes en trozos de unas decenas de
+        # miles de filas y una columna con texto sólo en algunos trozos queda mezclada, con los números de los
+        # trozos numéricos como float ("5.0" vale 5). Por bloques, esa columna es de texto en todas sus filas
+        # ("5.0" vale 0), igual que con process_file_mmap.
+        import pandas as pd
+        try:
+            if chunksize is None:
+                with self.__stage('read_csv'):
+                    df = pd.read_csv(file, delimiter=separator)
+                with self.__stage('validate_header'):
+                    _validate_header(df.columns)
+                self.__accumulate(df)
+            else:
+                # La cabecera se valida una única vez, antes de empezar a leer bloques
+                with self.__stage('validate_header'):
+                    _validate_header(pd.read_csv(file, delimiter=separator, nrows=0).columns)
+                tipos = _TypedTotals(self._rows is not None)
+                self.__read_typed(tipos, file, separator, chunksize, header=0)
+                self.__rescan_text(tipos, file, separator, chunksize, header=0)
+                self.__accumulate_typed(tipos)
+                if self._rows is not None:
+                    self._rows.append(tipos.rows())
+                    self._row_index = None
+            self._data_processed = True
+            return self
+
+        except FileNotFoundError:
+            # el valor de  self._data_processed se mantiene a False
+            return False
+
+
+    async def aprocess_file(self, file, separator, chunksize=None, executor=None, semaphore=None):
+        # Versión asyncio de process_file para no bloquear el bucle de eventos: la lectura y la conversión
+        # se ejecutan en executor (por defecto el pool de hilos del bucle; también vale un
+        # ProcessPoolExecutor) y el resultado se suma a este objeto al terminar. Con un
+        # asyncio.Semaphore se limita cuántas cargas se ejecutan a la vez. Con métricas, el Finanzas del
+        # executor mide con su propio MetricsFinanzas y sus valores se suman a los de este objeto.
+        import asyncio
+        loop = asyncio.get_running_loop()
+        args = (file, separator, chunksize, self._rows is not None, self._metrics is not None)
+        # contextlib.nullcontext no admite async with hasta Python 3.10
+        if semaphore is None:
+            fin = await loop.run_in_executor(executor, _process_one, *args)
+        else:
+            async with semaphore:
+                fin = await loop.run_in_executor(executor, _process_one, *args)
+        if fin is False:
+            # el valor de  self._data_processed se mantiene a False
+            return False
+        if self._metrics is not None:
+            self._metrics.merge(fin._metrics)
+        return self.merge(fin)
+
+    def process_file_mmap(self, file, separator, block_size=1 << 22):
+        # Motor alternativo a pandas para ficheros planos muy grandes: el fichero se proyecta en memoria
+        # (mmap) y finanzas_mmap lo recorre por bloques de block_size bytes, acumulando directamente en los
+        # 12 meses. Da los mismos totales que process_file() salvo en los casos descritos en finanzas_mmap.
+        import pandas as pd
+        import finanzas_mmap
+
+        try:
+            with open(file, 'rb') as f:
+                header = f.readline()
+                with self.__stage('validate_header'):
+                    _validate_header(pd.read_csv(io.BytesIO(header), delimiter=separator, nrows=0).columns)
+                if f.read(1):
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    counters = {}
+                    try:
+                        with self.__stage('scan'):
+                            gastos, ingresos = finanzas_mmap.scan(mm, separator, len(header), block_size, counters)
+                    finally:
+                        try:
+                            mm.close()
+                        except BufferError:
+                            # Aún hay vistas del buffer vivas (p.ej. en un traceback): se cerrará al liberarlas
+                            pass
+                    self._summary = None
+                    self.__drop_rows()
+                    for i in range(0, 12):
+                        self._gastos[i] += gastos[i]
+                        self._ingresos[i] += ingresos[i]
+                    if self._metrics is not None:
+                        self._metrics.count('rows', counters['rows'])
+                        self._metrics.count('cells', counters['rows'] * 12)
             self._data_processed = True
             return self
 
@@ -98,71 +593,497 @@ class Finanzas():
             # el valor de  self._data_processed se mantiene a False
             return False
 
+    def process_file_incremental(self, file, separator, chunksize=None):
+        # Para ficheros a los que sólo se añaden filas: la primera llamada valida la cabecera y procesa
+        # todo el fichero; las siguientes leen únicamente las filas añadidas desde la llamada anterior y
+        # las suman a los totales. Sólo se consumen líneas completas (terminadas en salto de línea), así
+        # que una fila que se esté escribiendo en ese momento se procesará en la siguiente llamada.
+        # De cada fichero se guardan los bytes ya consumidos y sus totales por tipo de columna (_TypedTotals),
+        # así que el resultado es el mismo que volver a procesar el fichero por bloques (ver process_file).
+        import pandas as pd
+        try:
+            path = os.path.abspath(file)
+            if self._offsets is None:
+                self._offsets = {}
+            offset, tipos = self._offsets.get(path, (0, None))
+            if os.path.getsize(path) < offset:
+                raise FileNotAppendOnly(f"File {file} is smaller than the {offset} bytes already processed.")
+
+            with open(path, 'rb') as f:
+                if offset == 0:
+                    header = f.readline()
+                    with self.__stage('validate_header'):
+                        _validate_header(pd.read_csv(io.BytesIO(header), delimiter=separator, nrows=0).columns)
+                    offset = f.tell()
+                else:
+                    f.seek(offset)
+                tail = f.read()
+
+            if tipos is None:
+                tipos = _TypedTotals(self._rows is not None)
+                if self._rows is not None:
+                    # Las filas del fichero se resuelven al construir el índice de filas, con los tipos de ese momento
+                    self._rows.append(tipos)
+            end = tail.rfind(b'\n') + 1
+            if end > 0:
+                before = tipos.totals() + (tipos.fallback_zero(),)
+                self.__read_typed(tipos, io.BytesIO(tail[:end]), separator, chunksize, header=None)
+                if tipos.pending():
+                    with open(path, 'rb') as f:
+                        f.readline()
+                        self.__rescan_text(tipos, f, separator, chunksize, header=None)
+                self.__accumulate_typed(tipos, before)
+                self._row_index = None
+            self._offsets[path] = (offset + end, tipos)
+            self._data_processed = True
+            return self
+
+        except FileNotFoundError:
+            # el valor de  self._data_processed se mantiene a False
+            return False
+
+    def process_binary(self, file):
+        # Carga el mismo formato de 12 meses desde un fichero binario por columnas generado con convert_csv():
+        # .npy (array estructurado con un campo por mes, leído con memory-map sin copiar los datos),
+        # .parquet o .feather (estos dos requieren pyarrow). Los valores ya están convertidos a enteros.
+        import numpy as np
+        import pandas as pd
+        try:
+            extension = os.path.splitext(file)[1].lower()
+            if extension == '.npy':
+                with self.__stage('read_binary'):
+                    data = np.load(file, mmap_mode='r')
+                columns = data.dtype.names or ()
+                with self.__stage('validate_header'):
+                    _validate_header(columns)
+                self._summary = None
+                with self.__stage('accumulate'):
+                    for col_index, col in enumerate(columns):
+                        self.__accumulate_values(col_index, data[col])
+                if len(data):
+                    self.__retain_rows([data[col] for col in columns])
+                if self._metrics is not None:
+                    self._metrics.count('rows', len(data))
+                    self._metrics.count('cells', len(data) * len(columns))
+            elif extension in _BINARY_READERS:
+                with self.__stage('read_binary'):
+                    df = getattr(pd, _BINARY_READERS[extension])(file)
+                with self.__stage('validate_header'):
+                    _validate_header(df.columns)
+                self.__accumulate(df)
+            else:
+                raise ValueError(f"Unsupported binary format {extension}. Expected .npy, .parquet or .feather.")
+            self._data_processed = True
+            return self
+
+        except FileNotFoundError:
+            # el valor de  self._data_processed se mantiene a False
+            return False
+
+    def to_bytes(self):
+        # Representación binaria compacta de los totales: 12 gastos y 12 ingresos en int64 (192 bytes)
+        return self._gastos.tobytes() + self._ingresos.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        # Reconstruye un Finanzas ya procesado a partir de to_bytes()
+        totals = array('q')
+        totals.frombytes(data)
+        if len(totals) != 24:
+            raise ValueError(f"Expected 24 monthly totals, found {len(totals)}.")
+        fin = cls()
+        fin._gastos = totals[:12]
+        fin._ingresos = totals[12:]
+        fin._data_processed = True
+        return fin
+
+    def merge(self, other):
+        # Suma mes a mes los totales de otro Finanzas ya procesado (p.ej. otra cuenta u otro año)
+        self._summary = None
+        if self._rows is not None and other._rows is not None:
+            self._rows.extend(bloque.rows() if isinstance(bloque, _TypedTotals) else bloque for bloque in other._rows)
+            self._row_index = None
+        elif other._data_processed:
+            self.__drop_rows()
+        for i in range(0, 12):
+            self._gastos[i] += other._gastos[i]
+            self._ingresos[i] += other._ingresos[i]
+        self._data_processed = self._data_processed or other._data_processed
+        return self
+
+    def __compute_summary(self):
+        # Una sola pasada por los 12 meses para obtener todas las estadísticas de los getters
+        min_gastos = self._gastos[0]
+        index_min = 0
+        max_savings = 0
+        saved_max = 0
+        index_max = None
+        total_gastos = 0
+        total_ingresos = 0
+        nelem = 12
+        for i in range(0, 12):
+            gastos = self._gastos[i]
+            ingresos = self._ingresos[i]
+            if gastos < min_gastos:
+                min_gastos = gastos
+                index_min = i
+            try:
+                savings = 100*((ingresos + gastos)/ingresos)
+            except ZeroDivisionError as e:
+                savings = 0
+            if savings > max_savings:
+                max_savings = savings
+                index_max = i
+                saved_max = ingresos + gastos
+            total_gastos += gastos
+            total_ingresos += ingresos
+            # Si la columna estaba vacía, la lista tiene un valor 0 por defecto, no la cuento en la media
+            if gastos == 0:
+                nelem -= 1
+
+        # Si ningún mes tiene ahorro o no hay gastos, el mes y la media no están definidos (None). Los getters
+        # lanzan en ese caso las mismas excepciones que cuando calculaban cada estadística por separado
+        return {'expenses_peak': abs(min_gastos),
+                'month_with_more_expenses': self._months[index_min],
+                'max_savings': max_savings,
+                'month_with_more_savings': None if index_max is None else self._months[index_max],
+                'saved_max': saved_max,
+                'year_expenses_mean': abs(total_gastos/nelem) if nelem else None,
+                'year_expenses': abs(total_gastos),
+                'year_incomes': total_ingresos}
+
+    def summary(self):
+        try:
+            assert self._data_processed == True
+            if self._summary is None:
+                with self.__stage('summary'):
+                    self._summary = self.__compute_summary()
+            return dict(self._summary)
+        except AssertionError as e:
+            print("No data has been loaded yet.")
 
     def get_month_with_more_expenses(self):
         try:
             assert self._data_processed == True
-            expenses_peak = abs(min(self._gastos))
-            month = self._months[self._gastos.index(min(self._gastos))]
-            return expenses_peak, month
+            summary = self.summary()
+            return summary['expenses_peak'], summary['month_with_more_expenses']
         except AssertionError as e:
             print("No data has been loaded yet.")
 
     def get_month_with_more_savings(self):
         try:
             assert self._data_processed == True
-            max_savings = 0
-            saved_max = 0
-            index_max = 13
-            for i in range(0, 12):
-                try:
-                    savings = 100*((self._ingresos[i] + (self._gastos[i]))/self._ingresos[i])
-                except ZeroDivisionError as e:
-                    savings = 0
-                if savings > max_savings:
-                    max_savings = savings
-                    index_max = i
-                    saved_max = self._ingresos[i] + self._gastos[i]
-            return max_savings, self._months[index_max], saved_max
+            summary = self.summary()
+            if summary['month_with_more_savings'] is None:
+                # Ningún mes tiene ahorro: no hay mes que devolver
+                raise IndexError("No month has savings.")
+            return summary['max_savings'], summary['month_with_more_savings'], summary['saved_max']
         except AssertionError as e:
             print("No data has been loaded yet.")
 
     def get_year_expenses_mean(self):
         try:
             assert self._data_processed == True
-            nelem=12
-            sum=0
-            for i in range(0, 12):
-                sum += self._gastos[i]
-                # Si la columna estaba vacía, la lista tiene un valor 0 por defecto, no la cuento en la media
-                if self._gastos[i] == 0:
-                    nelem -= 1
-            return abs(sum/nelem)
+            mean = self.summary()['year_expenses_mean']
+            if mean is None:
+                # Todos los meses tienen 0 gastos: la media se dividiría entre 0 meses
+                raise ZeroDivisionError("No month has expenses.")
+            return mean
         except AssertionError as e:
             print("No data has been loaded yet.")
 
     def get_year_expenses(self):
         try:
             assert self._data_processed == True
-            return abs(sum(self._gastos))
+            return self.summary()['year_expenses']
         except AssertionError as e:
             print("No data has been loaded yet.")
 
     def get_year_incomes(self):
         try:
             assert self._data_processed == True
-            return sum(self._ingresos)
+            return self.summary()['year_incomes']
+        except AssertionError as e:
+            print("No data has been loaded yet.")
+
+    def __build_row_index(self):
+        # Sumas acumuladas por mes a lo largo de las filas (fila 0 a ceros, así el total de las filas
+        # [start, stop) de cada mes es una resta) y las celdas con gasto ordenadas de mayor a menor gasto
+        import numpy as np
+        bloques = [bloque.rows() if isinstance(bloque, _TypedTotals) else bloque for bloque in self._rows]
+        filas = np.concatenate(bloques) if bloques else np.zeros((0, 12), dtype=np.int64)
+        if not any(isinstance(bloque, _TypedTotals) for bloque in self._rows):
+            # Los ficheros incrementales siguen recibiendo filas: sólo se juntan los bloques cerrados
+            self._rows = [filas]
+        gastos = np.minimum(filas, 0)
+        acumulado_gastos = np.zeros((len(filas) + 1, 12), dtype=np.int64)
+        acumulado_ingresos = np.zeros((len(filas) + 1, 12), dtype=np.int64)
+        np.cumsum(gastos, axis=0, out=acumulado_gastos[1:])
+        np.cumsum(filas - gastos, axis=0, out=acumulado_ingresos[1:])
+        celdas = filas.ravel()
+        negativas = np.flatnonzero(celdas < 0)
+        orden_gastos = negativas[np.argsort(celdas[negativas], kind='stable')]
+        return filas, acumulado_gastos, acumulado_ingresos, orden_gastos
+
+    def __row_index(self):
+        if self._rows is None:
+            raise RowsNotRetained("Row queries need Finanzas(retain_rows=True) and data loaded with "
+                                  "process_file, process_file_incremental or process_binary.")
+        if self._row_index is None:
+            self._row_index = self.__build_row_index()
+        return self._row_index
+
+    def get_expenses_between(self, first_month, last_month):
+        try:
+            assert self._data_processed == True
+            first, last = _month_range(first_month, last_month)
+            return abs(sum(self._gastos[first:last + 1]))
+        except AssertionError as e:
+            print("No data has been loaded yet.")
+
+    def get_incomes_between(self, first_month, last_month):
+        try:
+            assert self._data_processed == True
+            first, last = _month_range(first_month, last_month)
+            return sum(self._ingresos[first:last + 1])
+        except AssertionError as e:
+            print("No data has been loaded yet.")
+
+    def get_running_savings(self):
+        # Ahorro acumulado desde enero hasta cada mes
+        try:
+            assert self._data_processed == True
+            return list(itertools.accumulate(self._ingresos[i] + self._gastos[i] for i in range(0, 12)))
+        except AssertionError as e:
+            print("No data has been loaded yet.")
+
+    def get_rows_totals(self, start, stop):
+        # Gastos e ingresos de cada mes en las filas [start, stop) del fichero, sin recorrerlas
+        try:
+            assert self._data_processed == True
+            _, acumulado_gastos, acumulado_ingresos, _ = self.__row_index()
+            start, stop, _ = slice(start, stop).indices(len(acumulado_gastos) - 1)
+            stop = max(start, stop)
+            return ((acumulado_gastos[stop] - acumulado_gastos[start]).tolist(),
+                    (acumulado_ingresos[stop] - acumulado_ingresos[start]).tolist())
+        except AssertionError as e:
+            print("No data has been loaded yet.")
+
+    def get_top_expenses(self, n):
+        # Los n mayores gastos individuales como (importe, mes, fila)
+        try:
+            assert self._data_processed == True
+            filas, _, _, orden_gastos = self.__row_index()
+            return [(abs(int(filas.flat[celda])), self._months[celda % 12], int(celda // 12))
+                    for celda in orden_gastos[:n]]
         except AssertionError as e:
             print("No data has been loaded yet.")
 
     def plot_income_by_month(self):
+        # matplotlib sólo se importa cuando se pide un gráfico
+        from matplotlib import pyplot as ptl
         ptl.plot(self._ingresos)
         ptl.show()
 
+    def render_income_by_month(self, file=None, format=None):
+        # Versión sin pantalla de plot_income_by_month (para servidores): dibuja sobre un canvas Agg sin
+        # pasar por pyplot y lo guarda en file (ruta o fichero abierto) o, si file es None, devuelve los bytes
+        return render_incomes_by_month([self], None if file is None else [file], format)[0]
+
     def is_data_loaded(self):
         return self._data_processed
 
 
+_BINARY_READERS = {'.parquet': 'read_parquet', '.feather': 'read_feather'}
+_BINARY_WRITERS = {'.parquet': 'to_parquet', '.feather': 'to_feather'}
+
+
+def convert_csv(file, separator, output):
+    # Convierte un CSV con el formato de process_file a un formato binario por columnas (según la extensión
+    # de output: .npy, .parquet o .feather) con los valores ya convertidos a int64, para que
+    # Finanzas().process_binary(output) no tenga que volver a parsear ni convertir texto.
+    import numpy as np
+    import pandas as pd
+    df = pd.read_csv(file, delimiter=separator)
+    # Validamos la cabecera con las mismas reglas que process_file
+    _validate_header(df.columns)
+    columns = {col: _coerce_column(df[col]) for col in df}
+
+    extension = os.path.splitext(output)[1].lower()
+    if extension == '.npy':
+        data = np.empty(len(df), dtype=[(col, np.int64) for col in columns])
+        for col, valores in columns.items():
+            data[col] = valores
+        np.save(output, data)
+    elif extension in _BINARY_WRITERS:
+        getattr(pd.DataFrame(columns), _BINARY_WRITERS[extension])(output)
+    else:
+        raise ValueError(f"Unsupported binary format {extension}. Expected .npy, .parquet or .feather.")
+    return output
+
+
+def render_incomes_by_month(finanzas, files=None, format=None):
+    # Gráficos de ingresos por mes de muchos Finanzas reutilizando una única figura y su canvas: para cada
+    # objeto sólo se cambian los datos de la línea y se reajustan los ejes antes de guardar. Con files
+    # (una ruta o fichero abierto por objeto) se escriben las imágenes y se devuelve files; sin files se
+    # devuelve la lista de imágenes en bytes.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    line, = axes.plot(range(0, 12), [0] * 12)
+    images = []
+    for index, fin in enumerate(finanzas):
+        line.set_ydata(fin._ingresos)
+        axes.relim()
+        axes.autoscale_view()
+        if files is None:
+            target = io.BytesIO()
+            figure.savefig(target, format=format)
+            images.append(target.getvalue())
+        else:
+            figure.savefig(files[index], format=format)
+    return images if files is None else files
+
+
+def _process_one(file, separator, chunksize, retain_rows=False, metrics=False):
+    # Se ejecuta en los procesos del pool: devuelve el Finanzas del fichero (o False si no existe).
+    # Con metrics=True mide con un MetricsFinanzas nuevo (sin hook), que viaja con el resultado
+    if metrics:
+        from finanzas_metrics import MetricsFinanzas
+        metrics = MetricsFinanzas()
+    return Finanzas(retain_rows, metrics or None).process_file(file, separator, chunksize)
+
+
+def _process_batch_one(file, separator, chunksize, retain_rows=False):
+    # Como _process_one, pero un fichero con formato incorrecto no detiene el lote: devuelve
+    # (Finanzas o False, error, segundos), con error None, 'File not found' o 'Excepción: mensaje'
+    start = time.perf_counter()
+    try:
+        fin, error = _process_one(file, separator, chunksize, retain_rows), None
+        if fin is False:
+            error = 'File not found'
+    except Exception as e:
+        fin, error = False, f"{type(e).__name__}: {e}"
+    return fin, error, time.perf_counter() - start
+
+
+def process_files(files, separator, max_workers=None, chunksize=None, retain_rows=False, errors=None,
+                  progress=None):
+    # Procesa muchos ficheros (lista de rutas o patrón glob) en paralelo con un pool de procesos (con
+    # max_workers=1 o un solo fichero, en este proceso).
+    # Devuelve un diccionario {fichero: Finanzas o False} y un Finanzas con el total de todos ellos.
+    # Un fichero que no existe o con formato incorrecto no detiene el lote: su resultado es False y, si se
+    # pasa un diccionario errors, errors[fichero] guarda el motivo ('File not found' o 'Excepción: mensaje').
+    # progress(hechos, total, fichero, error, segundos) se llama cada vez que termina un fichero.
+    # Con retain_rows=True cada Finanzas (y el total) guarda también las filas para las consultas por fila.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    if isinstance(files, str):
+        files = sorted(glob.glob(files))
+    else:
+        files = list(files)
+    # Un fichero repetido se carga una sola vez (pero cuenta en el total tantas veces como aparezca)
+    pending = list(dict.fromkeys(files))
+    outcomes = {}
+
+    def done(file, outcome):
+        outcomes[file] = outcome
+        _, error, seconds = outcome
+        if error is not None and errors is not None:
+            errors[file] = error
+        if progress is not None:
+            progress(len(outcomes), len(pending), file, error, seconds)
+
+    if max_workers == 1 or len(pending) <= 1:
+        for file in pending:
+            done(file, _process_batch_one(file, separator, chunksize, retain_rows))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_process_batch_one, file, separator, chunksize, retain_rows): file
+                       for file in pending}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+
+    # Resultados y total en el orden de files, sea cual sea el orden en que terminan
+    results = {file: outcomes[file][0] for file in files}
+    total = Finanzas(retain_rows)
+    for file in files:
+        if results[file] is not False:
+            total.merge(results[file])
+    return results, total
+
+
+async def aprocess_files(files, separator, max_concurrency=4, executor=None, chunksize=None, retain_rows=False):
+    # Equivalente asyncio de process_files: como mucho max_concurrency ficheros se leen a la vez, de modo
+    # que un fichero grande no acapara el executor y el resto de peticiones sigue avanzando.
+    import asyncio
+    if isinstance(files, str):
+        files = sorted(glob.glob(files))
+    else:
+        files = list(files)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(*(Finanzas(retain_rows).aprocess_file(file, separator, chunksize, executor,
+                                                                         semaphore)
+                                     for file in files))
+
+    total = Finanzas(retain_rows)
+    for fin in results:
+        if fin is not False:
+            total.merge(fin)
+    return dict(zip(files, results)), total
+
+
+def _savings_percentage(ingresos, gastos):
+    # Misma fórmula que get_month_with_more_savings, 100*((ingresos + gastos)/ingresos), sobre arrays de
+    # NumPy; sin ingresos el porcentaje de ahorro es 0
+    import numpy as np
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ingresos != 0, 100*((ingresos + gastos)/ingresos), 0.0)
+
+
+def summarize(finanzas):
+    # Versión por lotes de Finanzas.summary(): calcula las mismas estadísticas para muchos objetos a la
+    # vez sobre matrices (n, 12) y devuelve una tabla con una fila por objeto y una columna por estadística.
+    # Los objetos sin datos cargados tienen data_loaded=False y el resto de columnas vacías (NaN/None).
+    import numpy as np
+    import pandas as pd
+    finanzas = list(finanzas)
+    n = len(finanzas)
+    gastos = np.frombuffer(b''.join(fin._gastos.tobytes() for fin in finanzas), dtype=np.int64).reshape(n, 12)
+    ingresos = np.frombuffer(b''.join(fin._ingresos.tobytes() for fin in finanzas), dtype=np.int64).reshape(n, 12)
+    loaded = np.array([fin._data_processed for fin in finanzas], dtype=bool)
+    months = np.array(Finanzas._months, dtype=object)
+    rows = np.arange(n)
+
+    index_min = gastos.argmin(axis=1)
+    savings = _savings_percentage(ingresos, gastos)
+    index_max = savings.argmax(axis=1)
+    max_savings = savings[rows, index_max]
+    has_savings = max_savings > 0
+    nelem = np.count_nonzero(gastos, axis=1)
+    total_gastos = gastos.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(nelem > 0, np.abs(total_gastos/nelem), np.nan)
+
+    table = pd.DataFrame({
+        'data_loaded': loaded,
+        'expenses_peak': np.abs(gastos[rows, index_min]),
+        'month_with_more_expenses': months[index_min],
+        'max_savings': np.where(has_savings, max_savings, 0.0),
+        'month_with_more_savings': np.where(has_savings, months[index_max], None),
+        'saved_max': np.where(has_savings, (ingresos + gastos)[rows, index_max], 0),
+        'year_expenses_mean': mean,
+        'year_expenses': np.abs(total_gastos),
+        'year_incomes': ingresos.sum(axis=1),
+    })
+    if not loaded.all():
+        table.loc[~loaded, table.columns[1:]] = None
+    return table
+
+
 class InvalidNumberOfColumns(Exception):
     pass
 
@@ -173,3 +1094,11 @@ class InvalidColumnNameOrOrder(Exception):
 
 class ColumnIsEmpty(Exception):
     pass
+
+
+class FileNotAppendOnly(Exception):
+    pass
+
+
+class RowsNotRetained(Exception):
+    pass
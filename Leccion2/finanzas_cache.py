@@ -0,0 +1,92 @@
+import hashlib
+import os
+from finanzas import Finanzas
+
+
+class CacheFinanzas():
+    # Caché en disco de los totales mensuales de Finanzas. Cada fichero CSV procesado se guarda como una
+    # entrada binaria de 192 bytes (Finanzas.to_bytes()) cuyo nombre es la huella del fichero: ruta,
+    # tamaño y fecha de modificación, o bien un hash del contenido si use_content_hash=True. Si el
+    # fichero cambia, cambia la huella y la entrada antigua deja de usarse hasta que se desaloja.
+    # Se guardan como mucho max_entries entradas y se desalojan las usadas hace más tiempo (LRU).
+    _extension = '.fin'
+
+    def __init__(self, directory, max_entries=1024, use_content_hash=False):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.use_content_hash = use_content_hash
+        os.makedirs(directory, exist_ok=True)
+
+    def __key(self, file, separator, chunksize=None):
+        if self.use_content_hash:
+            digest = hashlib.sha256()
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            stat = os.stat(file)
+            digest = hashlib.sha256(f"{os.path.abspath(file)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        # El separador cambia el resultado del parseo, así que forma parte de la clave. La lectura por bloques da
+        # lo mismo con cualquier tamaño de bloque, pero puede no coincidir con la carga entera (ver
+        # Finanzas.process_file): sólo se distingue si se ha leído por bloques o no
+        digest.update(separator.encode())
+        if chunksize is not None:
+            digest.update(b"|chunked")
+        return os.path.join(self.directory, digest.hexdigest() + self._extension)
+
+    def __entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(self._extension)]
+
+    def __evict(self):
+        entries = self.__entries()
+        if len(entries) <= self.max_entries:
+            return
+        # La fecha de modificación de cada entrada se actualiza en cada acierto: las más antiguas son las menos usadas
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def process_file(self, file, separator, chunksize=None):
+        # Igual que Finanzas().process_file(), pero devuelve el resultado guardado si el fichero no ha cambiado
+        try:
+            entry = self.__key(file, separator, chunksize)
+        except FileNotFoundError:
+            return False
+
+        try:
+            with open(entry, 'rb') as f:
+                fin = Finanzas.from_bytes(f.read())
+            os.utime(entry)
+            return fin
+        except (FileNotFoundError, ValueError):
+            # Fallo de caché (o entrada corrupta): procesamos el fichero y guardamos el resultado
+            pass
+
+        fin = Finanzas().process_file(file, separator, chunksize)
+        if fin is False:
+            return False
+        # Escribimos en un temporal y lo renombramos para que nadie lea nunca una entrada a medias
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(fin.to_bytes())
+        os.replace(tmp, entry)
+        self.__evict()
+        return fin
+
+    def invalidate(self, file, separator, chunksize=None):
+        # Elimina la entrada del fichero en su estado actual. Devuelve True si existía.
+        try:
+            os.remove(self.__key(file, separator, chunksize))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        for entry in self.__entries():
+            os.remove(entry.path)
+
+    def __len__(self):
+        return len(self.__entries())
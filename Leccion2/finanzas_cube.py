@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from finanzas import Finanzas, _savings_percentage
+
+
+class CubeFinanzas():
+    # Almacén agregado de muchos Finanzas: un único array int64 de forma (cuentas, años, 12 meses, 2), donde
+    # el último eje es [gastos, ingresos]. Todas las agregaciones se hacen con operaciones de NumPy sobre
+    # el array, sin recorrer objetos en Python, de modo que decenas de miles de cuentas se resuelven en
+    # milisegundos. _loaded marca qué combinaciones (cuenta, año) tienen datos cargados.
+    __slots__ = ('accounts', 'years', '_data', '_loaded')
+
+    def __init__(self, accounts, years):
+        self.accounts = list(accounts)
+        self.years = list(years)
+        self._data = np.zeros((len(self.accounts), len(self.years), 12, 2), dtype=np.int64)
+        self._loaded = np.zeros((len(self.accounts), len(self.years)), dtype=bool)
+
+    @classmethod
+    def from_results(cls, results, key=None):
+        # results es un diccionario {(cuenta, año): Finanzas o False}, o el de process_files() junto con una
+        # función key(fichero) -> (cuenta, año). Si varias entradas caen en la misma celda se suman.
+        items = [((key(name) if key else name), fin) for name, fin in results.items() if fin is not False]
+        accounts, account_index = np.unique(np.array([k[0] for k, _ in items] or [], dtype=object),
+                                            return_inverse=True)
+        years, year_index = np.unique(np.array([k[1] for k, _ in items] or [], dtype=object), return_inverse=True)
+        cube = cls(accounts.tolist(), years.tolist())
+        if items:
+            totals = np.frombuffer(b''.join(fin.to_bytes() for _, fin in items), dtype=np.int64).reshape(-1, 2, 12)
+            np.add.at(cube._data, (account_index, year_index), totals.transpose(0, 2, 1))
+            # Como en add, una celda con varias entradas tiene datos si alguna los tiene
+            np.logical_or.at(cube._loaded, (account_index, year_index), [fin.is_data_loaded() for _, fin in items])
+        return cube
+
+    def add(self, account, year, fin):
+        # Suma un Finanzas a la celda (cuenta, año), que debe existir
+        i, j = self.accounts.index(account), self.years.index(year)
+        self._data[i, j, :, 0] += fin._gastos
+        self._data[i, j, :, 1] += fin._ingresos
+        self._loaded[i, j] |= fin.is_data_loaded()
+        return self
+
+    def get_account(self, account, year):
+        # Reconstruye el Finanzas de una celda (por ejemplo para usar sus getters)
+        i, j = self.accounts.index(account), self.years.index(year)
+        fin = Finanzas.from_bytes(self._data[i, j].T.tobytes())
+        fin._data_processed = bool(self._loaded[i, j])
+        return fin
+
+    def year_totals(self):
+        # Gastos (en positivo, como get_year_expenses), ingresos y ahorro de cada año sumando todas las cuentas
+        totals = self._data.sum(axis=(0, 2))
+        return pd.DataFrame({'year_expenses': np.abs(totals[:, 0]),
+                             'year_incomes': totals[:, 1],
+                             'savings': totals[:, 1] + totals[:, 0]}, index=pd.Index(self.years, name='year'))
+
+    def month_means(self, kind='expenses'):
+        # Media por mes entre las cuentas con datos de cada año: una fila por año y una columna por mes.
+        # kind='expenses' (en positivo), 'incomes' o 'savings'
+        values = {'expenses': -self._data[..., 0],
+                  'incomes': self._data[..., 1],
+                  'savings': self._data[..., 1] + self._data[..., 0]}[kind]
+        counts = self._loaded.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts[:, None] > 0, values.sum(axis=0) / counts[:, None], np.nan)
+        return pd.DataFrame(means, index=pd.Index(self.years, name='year'), columns=list(Finanzas._months))
+
+    def savings_ranking(self, year=None):
+        # Cuentas ordenadas de mayor a menor porcentaje de ahorro en el periodo (todos los años o uno solo),
+        # con el mismo porcentaje que get_month_with_more_savings aplicado a los totales de la cuenta
+        data = self._data if year is None else self._data[:, [self.years.index(year)]]
+        loaded = self._loaded.any(axis=1) if year is None else self._loaded[:, self.years.index(year)]
+        totals = data.sum(axis=(1, 2))
+        gastos, ingresos = totals[:, 0], totals[:, 1]
+        rate = _savings_percentage(ingresos, gastos)
+        order = np.flatnonzero(loaded)[np.argsort(-rate[loaded], kind='stable')]
+        return pd.DataFrame({'account': np.array(self.accounts, dtype=object)[order],
+                             'savings_rate': rate[order],
+                             'savings': (ingresos + gastos)[order],
+                             'expenses': np.abs(gastos[order]),
+                             'incomes': ingresos[order]},
+                            index=pd.RangeIndex(1, len(order) + 1, name='rank'))
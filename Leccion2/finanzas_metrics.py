@@ -0,0 +1,67 @@
+import time
+
+
+class MetricsFinanzas():
+    # Instrumentación opcional de Finanzas: Finanzas(metrics=MetricsFinanzas(hook)) mide el tiempo de cada
+    # etapa (read_csv, validate_header, coerce, accumulate, scan, read_binary, summary) y cuenta filas leídas,
+    # celdas convertidas y celdas de texto que acaban valiendo 0 porque int() daría ValueError.
+    # Los valores se acumulan en timers/counters y, si hay hook, se le envían también uno a uno como
+    # hook(tipo, nombre, valor) con tipo 'timer' (segundos) o 'counter' (incremento), p.ej. para statsd.
+    # Sin métricas (metrics=None, el valor por defecto) Finanzas no mide nada.
+    __slots__ = ('hook', 'timers', 'calls', 'counters')
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.calls = {}
+        self.counters = {'rows': 0, 'cells': 0, 'fallback_zero': 0}
+
+    def stage(self, name):
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.hook is not None:
+            self.hook('timer', name, seconds)
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.hook is not None:
+            self.hook('counter', name, value)
+
+    def merge(self, other):
+        # Suma los valores de otro MetricsFinanzas (p.ej. el de un proceso del pool). El hook recibe un
+        # único valor por etapa y contador con el total de other
+        for name, seconds in other.timers.items():
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + other.calls.get(name, 0)
+            if self.hook is not None:
+                self.hook('timer', name, seconds)
+        for name, value in other.counters.items():
+            if value:
+                self.count(name, value)
+        return self
+
+    def snapshot(self):
+        # Copia de los valores acumulados, lista para serializar
+        return {'timers': dict(self.timers), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+
+class _Timer():
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
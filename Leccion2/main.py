@@ -1,20 +1,128 @@
+import argparse
+import csv
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
 import finanzas
 
+FIELDS = ['file', 'data_loaded', 'error', 'seconds', 'expenses_peak', 'month_with_more_expenses', 'max_savings',
+          'month_with_more_savings', 'saved_max', 'year_expenses_mean', 'year_expenses', 'year_incomes']
 
-fin = finanzas.Finanzas()
-fin.process_file('finanzas2020.csv', '\t')
-print("APARTADO 1")
-print("1 - ¿Qué mes se ha gastado más?")
-expenses_peak, month = fin.get_month_with_more_expenses()
-print(f"    Respuesta: El mes de {month}, el gasto fue de {expenses_peak:.2f}.")
-print("2 - ¿Qué mes se ha ahorrado más?")
-max_savings, month, savings = fin.get_month_with_more_savings()
-print(f"    Respuesta: El mes de {month}, el ahorro fue de un {max_savings:.2f}% de lo ingresado ({savings:.2f}).")
-print("3 - ¿Cuál es la media de gastos al año?")
-print(f"    Respuesta: {fin.get_year_expenses_mean():.2f}")
-print("4 - ¿Cuál ha sido el gasto total a lo largo del año?")
-print(f"    Respuesta: El gasto total a lo largo del año fue {fin.get_year_expenses():.2f}")
-print("5 - ¿Cuáles han sido los ingresos totales a lo largo del año?")
-print(f"    Respuesta: Los ingresos totales a lo largo del año fueron {fin.get_year_incomes():.2f}")
-print("6 - Gráfica: Evolución de ingresos a lo largo del año")
-fin.plot_income_by_month()
+
+def expand_files(paths, pattern='*.csv'):
+    # Cada argumento puede ser un fichero, un patrón glob o un directorio (se buscan los pattern que contenga,
+    # también en subdirectorios)
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(fnmatch.filter(names, pattern)))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def load_files(files, separator, jobs=None, chunksize=None, progress=None):
+    # Carga los ficheros con finanzas.process_files (jobs procesos; con jobs=1 en este proceso) y devuelve
+    # [(fichero, Finanzas o False, error, segundos)] en el orden de files y el Finanzas con el total.
+    # progress(hechos, total, fichero, error, segundos) se llama cada vez que termina un fichero.
+    status = {}
+
+    def done(count, total, file, error, seconds):
+        status[file] = (error, seconds)
+        if progress is not None:
+            progress(count, total, file, error, seconds)
+
+    results, total = finanzas.process_files(files, separator, jobs, chunksize, progress=done)
+    return [(file, results[file]) + status[file] for file in files], total
+
+
+def record(file, fin, error, seconds):
+    # Fila de salida con todos los resultados de los getters (vacíos si no hay datos)
+    row = dict.fromkeys(FIELDS)
+    row.update(file=file, data_loaded=fin is not False, error=error, seconds=round(seconds, 6))
+    if fin is not False:
+        row.update(fin.summary())
+    return row
+
+
+def print_report(row, out=sys.stdout):
+    # Formato original de main.py
+    print(f"Fichero: {row['file']}", file=out)
+    if not row['data_loaded']:
+        print(f"    Error: {row['error']}", file=out)
+        return
+    print("APARTADO 1", file=out)
+    print("1 - ¿Qué mes se ha gastado más?", file=out)
+    print(f"    Respuesta: El mes de {row['month_with_more_expenses']}, el gasto fue de {row['expenses_peak']:.2f}.",
+          file=out)
+    print("2 - ¿Qué mes se ha ahorrado más?", file=out)
+    print(f"    Respuesta: El mes de {row['month_with_more_savings']}, el ahorro fue de un {row['max_savings']:.2f}% "
+          f"de lo ingresado ({row['saved_max']:.2f}).", file=out)
+    print("3 - ¿Cuál es la media de gastos al año?", file=out)
+    mean = row['year_expenses_mean']
+    print(f"    Respuesta: {'-' if mean is None else format(mean, '.2f')}", file=out)
+    print("4 - ¿Cuál ha sido el gasto total a lo largo del año?", file=out)
+    print(f"    Respuesta: El gasto total a lo largo del año fue {row['year_expenses']:.2f}", file=out)
+    print("5 - ¿Cuáles han sido los ingresos totales a lo largo del año?", file=out)
+    print(f"    Respuesta: Los ingresos totales a lo largo del año fueron {row['year_incomes']:.2f}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesa ficheros de finanzas y muestra los resultados de los getters.")
+    parser.add_argument('paths', nargs='*', default=['finanzas2020.csv'],
+                        help="Ficheros, directorios o patrones glob (por defecto finanzas2020.csv).")
+    parser.add_argument('--separator', default='\t', help="Separador de columnas ('tab' equivale a '\\t').")
+    parser.add_argument('--pattern', default='*.csv', help="Ficheros a buscar dentro de los directorios.")
+    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text',
+                        help="text: informe legible; json: una línea JSON por fichero; csv: una fila por fichero.")
+    parser.add_argument('--jobs', type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU).")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Filas por bloque al leer cada fichero.")
+    parser.add_argument('--total', action='store_true', help="Añade una fila con el total de todos los ficheros.")
+    parser.add_argument('--no-plot', action='store_true', help="No muestra la gráfica de ingresos al terminar.")
+    parser.add_argument('--quiet', action='store_true', help="Sin progreso ni tiempos en stderr.")
+    args = parser.parse_args(argv)
+
+    separator = '\t' if args.separator == 'tab' else args.separator
+    files = expand_files(args.paths, args.pattern)
+
+    def progress(done, total, file, error, seconds):
+        status = f"ERROR {error}" if error else f"{seconds:.3f} s"
+        print(f"[{done}/{total}] {file} {status}", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    results, total = load_files(files, separator, args.jobs, args.chunk_size, None if args.quiet else progress)
+    rows = [record(*result) for result in results]
+    if args.total:
+        rows.append(record('TOTAL', total if total.is_data_loaded() else False, None, time.perf_counter() - start))
+
+    if args.format == 'json':
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            print_report(row)
+
+    loaded = sum(row['data_loaded'] for row in rows[:len(results)])
+    if not args.quiet:
+        print(f"{len(results)} ficheros ({loaded} con datos, {len(results) - loaded} con errores) "
+              f"en {time.perf_counter() - start:.3f} s", file=sys.stderr)
+    if not args.no_plot and total.is_data_loaded():
+        if args.format == 'text':
+            print("6 - Gráfica: Evolución de ingresos a lo largo del año")
+        total.plot_income_by_month()
+    return 0 if loaded == len(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,21 @@
 import pytest
+import asyncio
 import csv
+import json
+import numpy as np
+import pandas as pd
 from finanzas import *
+from finanzas import _coerce_column, _TypedTotals
+from finanzas_cache import CacheFinanzas
+from finanzas_cube import CubeFinanzas
+from finanzas_metrics import MetricsFinanzas
+from benchmark_finanzas import generate_ledger, run_suite, _engines
+import main
 import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 def test_process_file_exception_InvalidNumberOfColumns_missing_col():
     # Test data: 11 columnas, falta el mes de Julio
@@ -210,6 +224,37 @@ def test_get_year_expenses_mean():
     assert fin.get_year_expenses_mean() == expected_expenses
     os.remove('empty_column.csv')
 
+def test_getters_without_savings_or_expenses():
+    # Un fichero sin filas, y otro sólo con ingresos: summary() deja el mes y la media a None y los getters
+    # lanzan las excepciones de siempre
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+    with open('empty_ledger.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+
+    fin = Finanzas().process_file('empty_ledger.csv', separator=',')
+    assert fin.get_month_with_more_expenses() == (0, 'enero')
+    assert fin.summary()['month_with_more_savings'] is None
+    assert fin.summary()['year_expenses_mean'] is None
+    with pytest.raises(IndexError):
+        fin.get_month_with_more_savings()
+    with pytest.raises(ZeroDivisionError):
+        fin.get_year_expenses_mean()
+    assert fin.get_year_expenses() == 0 and fin.get_year_incomes() == 0
+
+    with open('empty_ledger.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow([5] * 12)
+
+    fin = Finanzas().process_file('empty_ledger.csv', separator=',')
+    assert fin.get_month_with_more_savings() == (100.0, 'enero', 5)
+    with pytest.raises(ZeroDivisionError):
+        fin.get_year_expenses_mean()
+    os.remove('empty_ledger.csv')
+
 def test_get_year_expenses():
     header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
               'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
@@ -245,6 +290,783 @@ def test_get_year_incomes():
 
     assert fin.get_year_incomes() == expected_incomes
     os.remove('data.csv')
-    
+
+def test_process_file_vectorized_matches_cell_conversion():
+    # La conversión por columnas debe dar los mismos totales que __convert_2_numeric_type celda a celda
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = ["1.000,01", " 7", "+2", "3.1", -4.9, "True", "-6", "-7.9", "ups", 9, "1_000", 11]
+    row2 = ["", "-1.9'", "0", "NaN", 10, "False", "1,1", "-2,1", -1, 0.5, -10, "nan"]
+    row3 = [-3, "-3", "", 2.2, "", "", -8, "12", "", -0.5, "", -11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+        writer.writerow(row3)
+
+    fin = Finanzas().process_file('data.csv', separator=',')
+    convert = fin._Finanzas__convert_2_numeric_type
+    df = pd.read_csv('data.csv', delimiter=',')
+    expected_gastos = [sum(v for v in map(convert, df[col]) if v < 0) for col in df]
+    expected_ingresos = [sum(v for v in map(convert, df[col]) if v >= 0) for col in df]
+
+    assert list(fin._gastos) == expected_gastos
+    assert list(fin._ingresos) == expected_ingresos
+    os.remove('data.csv')
+
+def test_text_column_integers_match_cell_conversion():
+    # Los enteros simples de una columna de texto se convierten con NumPy: signo, ceros a la izquierda y
+    # 18 o 19 cifras deben dar lo mismo que int(), y un carácter nulo al final hace fallar a int(). Las celdas
+    # largas y los dígitos Unicode, que int() también acepta, van por pd.to_numeric y el patrón de int()
+    cells = ['-120', '+5', '007', '-0', '123456789012345678', '-999999999999999999', '1234567890123456789',
+             '9007199254740993', '5\x00', '5\x003', '-+5', '5-', '-', '12,5', ' 7', '1_000', None, 'ups',
+             '٣', ' -١٢_٣ ', '0' * 40 + '17', ' ' * 30 + '-4', '9' * 30 + '.5', 'x' * 2000]
+    convert = Finanzas()._Finanzas__convert_2_numeric_type
+    columna = pd.Series(cells, dtype=object)
+    metrics = MetricsFinanzas()
+
+    valores = _coerce_column(columna, metrics)
+    assert valores.tolist() == [0 if cell is None else convert(cell) for cell in cells]
+    assert metrics.counters['fallback_zero'] == 9
+
+def test_process_file_chunked_matches_full_load():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    rows = [[(i * 7 + j * 13) % 41 - 20 for j in range(12)] for i in range(25)]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    full = Finanzas().process_file('data.csv', separator=',')
+    chunked = Finanzas().process_file('data.csv', separator=',', chunksize=4)
+
+    assert chunked.is_data_loaded() is True
+    assert list(chunked._gastos) == list(full._gastos)
+    assert list(chunked._ingresos) == list(full._ingresos)
+    os.remove('data.csv')
+
+def test_process_file_chunked_matches_full_load_with_mixed_types():
+    # pandas infiere el tipo de cada columna por bloque: con chunksize=1 "-7.9" está sola en un bloque numérico
+    # y se truncaría a -7, pero en el fichero entero la columna de Agosto es de texto y vale 0
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [ "1.000,01", 1, "2", "3.1", 4.2, -5, "-6", "-7.9", "ups", 9, 10, 11]
+    row2 = ["", "-1.9'", "0", "NaN", 10, 0.432321, "1,1", "-2,1", -1, 0, -10, 11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+
+    full = Finanzas(retain_rows=True).process_file('data.csv', separator=',')
+    for chunksize in (1, 2, 3):
+        chunked = Finanzas(retain_rows=True).process_file('data.csv', separator=',', chunksize=chunksize)
+        assert list(chunked._gastos) == list(full._gastos)
+        assert list(chunked._ingresos) == list(full._ingresos)
+        assert chunked.get_year_expenses() == 22
+        assert chunked.get_rows_totals(0, 2) == full.get_rows_totals(0, 2)
+        assert chunked.get_top_expenses(5) == full.get_top_expenses(5)
+    os.remove('data.csv')
+
+def test_process_file_chunked_rereads_columns_that_turn_out_text():
+    # Los primeros bloques de Enero son numéricos ("5.0" y "5" dan el mismo float) y el último tiene texto: en el
+    # fichero entero la columna es de texto y "5.0" vale 0. Las comillas sueltas dentro de una celda sin
+    # comillas no alargan los bloques
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    rows = [["5.0", '7"', 1, 2, 3, 4, 5, 6, 7, 8, 9, -10],
+            [5, 3, "", -2, 3, 4, 5, 6, 7, 8, 9, -10],
+            ["", 4, "1e3", 2, 3, 4, 5, 6, 7, 8, 9, -10],
+            [-8, 1, 2, 2, 3, 4, 5, 6, 7, 8, 9, -10],
+            ["ups", 1, 2, 2, 3, 4, 5, 6, 7, 8, 9, "-10.5"]]
+
+    with open('data.tsv', 'w', encoding='UTF8') as f:
+        f.write('\t'.join(header) + '\n')
+        for row in rows:
+            f.write('\t'.join(map(str, row)) + '\n')
+
+    expected = MetricsFinanzas()
+    full = Finanzas(retain_rows=True, metrics=expected).process_file('data.tsv', separator='\t')
+    assert full.get_incomes_between('Enero', 'Enero') == 5
+    # Un bloque cada chunksize filas y, si Enero ha empezado siendo numérica, otra pasada para releerla como texto
+    for chunksize, blocks in ((1, 5 + 5), (2, 3 + 3), (5, 1)):
+        metrics = MetricsFinanzas()
+        chunked = Finanzas(retain_rows=True, metrics=metrics).process_file('data.tsv', separator='\t',
+                                                                           chunksize=chunksize)
+        assert list(chunked._gastos) == list(full._gastos)
+        assert list(chunked._ingresos) == list(full._ingresos)
+        assert chunked.get_top_expenses(20) == full.get_top_expenses(20)
+        assert metrics.counters == expected.counters
+        assert metrics.calls['coerce'] == blocks
+    os.remove('data.tsv')
+
+def test_process_file_chunked_with_blocks_mixing_floats_and_text():
+    # Con low_memory, pandas lee un bloque grande en trozos y la columna de Enero sale mezclada: floats de los
+    # trozos sin texto y cadenas del último. Por bloques la columna es de texto entera y "5.0" vale 0
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        f.write(','.join(header) + '\n')
+        f.write('5.0,1,1,1,1,1,1,1,1,1,1,-1\n' * 69999)
+        f.write('abc,1,1,1,1,1,1,1,1,1,1,-1\n')
+
+    # El bloque mezclado se suma sin llamar a len() sobre los floats y Enero queda pendiente de releer como texto
+    block = pd.DataFrame({month: [1, 1, 1] for month in Finanzas._months})
+    block['enero'] = pd.Series([5.0, 'abc', float('nan')], dtype=object)
+    tipos = _TypedTotals()
+    tipos.add(block)
+    assert tipos.pending() == [0]
+    assert tipos.numeric[1].tolist() == [5] + [3] * 11
+    mmap = Finanzas().process_file_mmap('data.csv', separator=',')
+    for chunksize in (1000, 100000):
+        chunked = Finanzas().process_file('data.csv', separator=',', chunksize=chunksize)
+        assert list(chunked._gastos) == list(mmap._gastos)
+        assert list(chunked._ingresos) == list(mmap._ingresos)
+        assert chunked.get_incomes_between('Enero', 'Enero') == 0
+        assert chunked.get_incomes_between('Febrero', 'Febrero') == 70000
+    incremental = Finanzas().process_file_incremental('data.csv', separator=',')
+    assert list(incremental._ingresos) == list(mmap._ingresos)
+    os.remove('data.csv')
+
+def test_process_file_chunked_validates_header():
+    # La cabecera se valida aunque el fichero no tenga filas que leer por bloques
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Octubre', 'Septiembre', 'Noviembre', 'Diciembre']
+
+    with open('bad_column_order.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+
+    with pytest.raises(InvalidColumnNameOrOrder, match="Column name or column order is not correct.*"):
+        Finanzas().process_file('bad_column_order.csv', separator=',', chunksize=10)
+    os.remove('bad_column_order.csv')
+
+def test_process_files_merges_results():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+    row2 = [-3, -2, -2, -3, -4, -5, -6, -7, -8, -9, 10, -11]
+
+    for name, row in (('batch_1.csv', row1), ('batch_2.csv', row2)):
+        with open(name, 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow(row)
+
+    results, total = process_files('batch_*.csv', separator=',', max_workers=2)
+
+    assert sorted(results) == ['batch_1.csv', 'batch_2.csv']
+    assert results['batch_1.csv'].get_year_incomes() == 1 + 2 + 3 + 4 + 5 + 6 + 5 + 1 + 9
+    assert total.is_data_loaded() is True
+    assert total.get_year_incomes() == 1 + 2 + 3 + 4 + 5 + 6 + 5 + 1 + 9 + 10
+    assert total.get_year_expenses() == abs(sum(row2) - 10 - 7)
+    os.remove('batch_1.csv')
+    os.remove('batch_2.csv')
+
+def test_process_files_missing_file():
+    results, total = process_files(['incorrect_filename.csv'], separator=',', max_workers=1)
+
+    assert results['incorrect_filename.csv'] is False
+    assert total.is_data_loaded() is False
+
+def test_process_files_keeps_going_after_invalid_file():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    with open('batch_ok.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow([1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1])
+    with open('batch_bad.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header[::-1])
+        writer.writerow([1] * 12)
+
+    files = ['batch_bad.csv', 'batch_ok.csv', 'incorrect_filename.csv']
+    expected = Finanzas().process_file('batch_ok.csv', separator=',')
+    for max_workers in (1, 2):
+        errors, calls = {}, []
+        results, total = process_files(files + ['batch_ok.csv'], separator=',', max_workers=max_workers,
+                                       errors=errors, progress=lambda *args: calls.append(args))
+        assert list(results) == files
+        # batch_ok.csv se carga una vez pero cuenta dos en el total
+        assert total.get_year_expenses() == 2 * expected.get_year_expenses()
+        assert sorted(call[0] for call in calls) == [1, 2, 3]
+        assert sorted((file, error) for _, count, file, error, _ in calls) == sorted(
+            (file, errors.get(file)) for file in files)
+        assert all(count == 3 and seconds >= 0 for _, count, _, _, seconds in calls)
+        assert results['batch_bad.csv'] is False and results['incorrect_filename.csv'] is False
+        assert results['batch_ok.csv'].get_year_incomes() == expected.get_year_incomes()
+        assert sorted(errors) == ['batch_bad.csv', 'incorrect_filename.csv']
+        assert errors['batch_bad.csv'].startswith('InvalidColumnNameOrOrder: ')
+        assert errors['incorrect_filename.csv'] == 'File not found'
+    os.remove('batch_ok.csv')
+    os.remove('batch_bad.csv')
+
+def test_finanzas_instances_do_not_share_state():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+
+    fin = Finanzas().process_file('data.csv', separator=',')
+    other = Finanzas()
+
+    assert other.is_data_loaded() is False
+    assert list(other._gastos) == [0] * 12 and list(other._ingresos) == [0] * 12
+    assert fin._gastos.typecode == 'q'
+    with pytest.raises(AttributeError):
+        fin.extra = 1
+    os.remove('data.csv')
+
+def test_summary_is_cached_and_invalidated():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [0, 2, 3, 10, 20, 0, 6, 7, 8, 14, 10, 11]
+    row2 = [0, -1, -1, -5, -11, -5, -6, -7, -1, -1, -19, -11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+
+    fin = Finanzas().process_file('data.csv', separator=',')
+    summary = fin.summary()
+
+    assert summary['month_with_more_expenses'] == 'noviembre'
+    assert summary['month_with_more_savings'] == 'octubre'
+    assert summary['year_incomes'] == sum(row1)
+    assert fin.summary() == summary
+
+    fin.merge(Finanzas().process_file('data.csv', separator=','))
+    assert fin.summary()['year_incomes'] == 2 * sum(row1)
+    assert fin.get_year_expenses() == 2 * abs(sum(row2))
+    os.remove('data.csv')
+
+def test_summarize_matches_getters():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    rows = [[1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1],
+            [0, 2, 3, 10, 20, 0, 6, 7, 8, 14, 10, 11],
+            [-3, -2, -2, -3, -4, -5, -6, -7, -8, -9, 10, -11]]
+
+    accounts = []
+    for row in rows:
+        with open('data.csv', 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow(row)
+        accounts.append(Finanzas().process_file('data.csv', separator=','))
+    accounts.append(Finanzas())
+
+    table = summarize(accounts)
+
+    assert len(table) == 4
+    assert list(table['data_loaded']) == [True, True, True, False]
+    for i, fin in enumerate(accounts[:3]):
+        for key, value in fin.summary().items():
+            if value is None:
+                assert table[key][i] is None or pd.isna(table[key][i])
+            else:
+                assert table[key][i] == value
+    os.remove('data.csv')
+
+def test_process_file_incremental_reads_only_new_rows():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+    row2 = [-3, -2, -2, -3, -4, -5, -6, -7, -8, -9, 10, -11]
+
+    with open('ledger.csv', 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+
+    fin = Finanzas().process_file_incremental('ledger.csv', separator=',')
+    assert fin.get_year_incomes() == 1 + 2 + 3 + 4 + 5 + 6 + 5 + 1 + 9
+
+    # Se añade una fila completa y otra a medio escribir (sin salto de línea)
+    with open('ledger.csv', 'a', encoding='UTF8', newline='') as f:
+        csv.writer(f).writerow(row2)
+        f.write('1,2,3')
+    fin.process_file_incremental('ledger.csv', separator=',')
+    assert fin.get_year_incomes() == 1 + 2 + 3 + 4 + 5 + 6 + 5 + 1 + 9 + 10
+
+    with open('ledger.csv', 'a', encoding='UTF8', newline='') as f:
+        f.write(',4,5,6,7,8,9,10,11,12\r\n')
+    fin.process_file_incremental('ledger.csv', separator=',')
+    full = Finanzas().process_file('ledger.csv', separator=',')
+
+    assert list(fin._gastos) == list(full._gastos)
+    assert list(fin._ingresos) == list(full._ingresos)
+    os.remove('ledger.csv')
+
+def test_process_file_incremental_matches_full_load_with_mixed_types():
+    # La fila añadida tiene "3.7" en Enero: sola se truncaría a 3, pero con "ups" la columna es de texto y vale 0
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = ["ups", -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+    row2 = ["3.7", -2, "-2.5", -3, -4, -5, -6, -7, -8, -9, 10, -11]
+    row3 = [1, 2, "x", 4, 5, 6, 7, 8, 9, 10, 11, 12]
+
+    with open('ledger.csv', 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+
+    fin = Finanzas(retain_rows=True).process_file_incremental('ledger.csv', separator=',')
+    for row in (row2, row3):
+        with open('ledger.csv', 'a', encoding='UTF8', newline='') as f:
+            csv.writer(f).writerow(row)
+        fin.process_file_incremental('ledger.csv', separator=',', chunksize=1)
+        full = Finanzas(retain_rows=True).process_file('ledger.csv', separator=',')
+
+        assert list(fin._gastos) == list(full._gastos)
+        assert list(fin._ingresos) == list(full._ingresos)
+        assert fin.get_top_expenses(20) == full.get_top_expenses(20)
+    assert fin.get_incomes_between('Enero', 'Enero') == 1
+    os.remove('ledger.csv')
+
+def test_process_file_incremental_detects_truncated_file():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+    with open('ledger.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow([1] * 12)
+    fin = Finanzas().process_file_incremental('ledger.csv', separator=',')
+
+    with open('ledger.csv', 'w', encoding='UTF8') as f:
+        csv.writer(f).writerow(header)
+
+    with pytest.raises(FileNotAppendOnly):
+        fin.process_file_incremental('ledger.csv', separator=',')
+    os.remove('ledger.csv')
+
+def test_cache_returns_stored_result_until_file_changes():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+
+    cache = CacheFinanzas('cache_dir', max_entries=2)
+    fin = cache.process_file('data.csv', separator=',')
+    cached = cache.process_file('data.csv', separator=',')
+
+    assert len(cache) == 1
+    assert cached is not fin
+    assert list(cached._gastos) == list(fin._gastos)
+    assert list(cached._ingresos) == list(fin._ingresos)
+    assert cached.get_year_expenses() == 7
+
+    # La lectura por bloques tiene su propia entrada, la misma para cualquier tamaño de bloque
+    cache.process_file('data.csv', separator=',', chunksize=1)
+    assert len(cache) == 2
+    assert cache.process_file('data.csv', separator=',', chunksize=1000).get_year_expenses() == 7
+    assert len(cache) == 2
+    assert cache.invalidate('data.csv', separator=',', chunksize=2) is True
+    assert cache.invalidate('data.csv', separator=',', chunksize=1) is False
+
+    assert cache.invalidate('data.csv', separator=',') is True
+    assert len(cache) == 0
+    assert cache.process_file('incorrect_filename.csv', separator=',') is False
+    shutil.rmtree('cache_dir')
+    os.remove('data.csv')
+
+def test_cache_evicts_least_recently_used():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+    cache = CacheFinanzas('cache_dir', max_entries=2, use_content_hash=True)
+    for i in range(3):
+        with open(f'data_{i}.csv', 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow([i] * 12)
+        cache.process_file(f'data_{i}.csv', separator=',')
+
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0
+    shutil.rmtree('cache_dir')
+    for i in range(3):
+        os.remove(f'data_{i}.csv')
+
+def test_process_binary_npy_matches_csv():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = ["1.000,01", 1, "2", "3.1", 4.2, -5, "-6", "-7.9", "ups", 9, 10, 11]
+    row2 = ["", "-1.9'", "0", "NaN", 10, 0.432321, "1,1", "-2,1", -1, 0, -10, 11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+
+    convert_csv('data.csv', ',', 'data.npy')
+    fin = Finanzas().process_binary('data.npy')
+    expected = Finanzas().process_file('data.csv', separator=',')
+
+    assert fin.is_data_loaded() is True
+    assert list(fin._gastos) == list(expected._gastos)
+    assert list(fin._ingresos) == list(expected._ingresos)
+    assert Finanzas().process_binary('incorrect_filename.npy') is False
+    os.remove('data.csv')
+    os.remove('data.npy')
+
+def test_process_binary_parquet_matches_csv():
+    pytest.importorskip('pyarrow')
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+    row2 = [-3, -2, -2, -3, -4, -5, -6, -7, -8, -9, 10, -11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+
+    convert_csv('data.csv', ',', 'data.parquet')
+    fin = Finanzas().process_binary('data.parquet')
+
+    assert fin.get_year_incomes() == 1 + 2 + 3 + 4 + 5 + 6 + 5 + 1 + 9 + 10
+    os.remove('data.csv')
+    os.remove('data.parquet')
+
+def test_process_binary_validates_header():
+    data = np.zeros(2, dtype=[(month, np.int64) for month in ['Enero', 'Febrero', 'Marzo']])
+    np.save('bad_columns.npy', data)
+
+    with pytest.raises(InvalidNumberOfColumns, match="Invalid number of columns. Expected 12 found 3."):
+        Finanzas().process_binary('bad_columns.npy')
+    os.remove('bad_columns.npy')
+
+def test_process_file_mmap_matches_process_file():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    rows = [["1.000,01", 1, "2", "3.1", 4.2, -5, "-6", "-7.9", "ups", 9, 10, 11],
+            ["", "-1.9'", "0", "NaN", 10, 0.432321, "1,1", "-2,1", -1, 0, -10, 11],
+            [123456789012, -3, " 7 ", "1e3", -0.5, 8, "+4", 12, "inf", -987654321, 5, "\"1,5\""]]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows * 5:
+            writer.writerow(row)
+
+    expected = Finanzas().process_file('data.csv', separator=',')
+    # Bloques pequeños para que las filas se repartan entre varios bloques
+    for block_size in (64, 1 << 22):
+        fin = Finanzas().process_file_mmap('data.csv', separator=',', block_size=block_size)
+        assert fin.is_data_loaded() is True
+        assert list(fin._gastos) == list(expected._gastos)
+        assert list(fin._ingresos) == list(expected._ingresos)
+    assert Finanzas().process_file_mmap('incorrect_filename.csv', separator=',') is False
+    os.remove('data.csv')
+
+def test_benchmark_ledger_format_and_suite():
+    generate_ledger('ledger.csv', 200, separator=',', nan_rate=0.1, comma_rate=0.1)
+    df = pd.read_csv('ledger.csv', delimiter=',')
+
+    assert list(df.columns) == ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+                                'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    assert len(df) == 200
+    assert df.isna().any().any()
+    assert df.astype(str).apply(lambda col: col.str.contains(',')).any().any()
+    assert Finanzas().process_file('ledger.csv', separator=',').is_data_loaded() is True
+    # Los motores que se comparan dan los mismos totales que la conversión celda a celda
+    runs = _engines('ledger.csv', ',', chunksize=64)
+    expected = runs['cells']()
+    for name in ('pandas', 'chunked'):
+        assert list(runs[name]()._gastos) == list(expected._gastos)
+        assert list(runs[name]()._ingresos) == list(expected._ingresos)
+    os.remove('ledger.csv')
+
+    results = run_suite([50], ['\t'], repeat=1, engines=('pandas',))
+    case = results['cases'][0]
+    assert case['rows'] == 50 and case['separator'] == 'tab'
+    assert case['engines']['pandas']['rows_per_second'] > 0
+    assert case['engines']['pandas']['peak_rss_increase_bytes'] >= 0
+    assert set(case['getters']) == {'summary', 'get_month_with_more_expenses', 'get_month_with_more_savings',
+                                    'get_year_expenses_mean', 'get_year_expenses', 'get_year_incomes'}
+
+def test_aprocess_file_matches_process_file():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    for i in range(3):
+        with open(f'data_{i}.csv', 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow([i, -1, 2, 3, -4, 5, 6, 7, -8, 9, 10, i - 11])
+
+    fin = asyncio.run(Finanzas().aprocess_file('data_0.csv', separator=','))
+    expected = Finanzas().process_file('data_0.csv', separator=',')
+    assert list(fin._gastos) == list(expected._gastos)
+    assert list(fin._ingresos) == list(expected._ingresos)
+    assert asyncio.run(Finanzas().aprocess_file('incorrect_filename.csv', separator=',')) is False
+
+    files = [f'data_{i}.csv' for i in range(3)] + ['incorrect_filename.csv']
+    results, total = asyncio.run(aprocess_files(files, separator=',', max_concurrency=2))
+    _, expected_total = process_files(files, separator=',', max_workers=1)
+    assert results['incorrect_filename.csv'] is False
+    assert total.get_year_incomes() == expected_total.get_year_incomes()
+    assert total.get_year_expenses() == expected_total.get_year_expenses()
+    for i in range(3):
+        os.remove(f'data_{i}.csv')
+
+def test_row_queries_with_retained_rows():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = [1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1]
+    row2 = [-3, -2, -2, -3, -4, -5, -6, -7, -8, -9, 10, -11]
+    row3 = ["1,5", 7, "ups", -20, 3.9, 0, 1, 1, 1, 1, 1, 1]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+        writer.writerow(row3)
+
+    fin = Finanzas(retain_rows=True).process_file('data.csv', separator=',', chunksize=2)
+    gastos, ingresos = fin.get_rows_totals(0, 3)
+    assert gastos == list(fin._gastos)
+    assert ingresos == list(fin._ingresos)
+    assert fin.get_rows_totals(1, 2) == ([min(v, 0) for v in row2], [max(v, 0) for v in row2])
+    assert fin.get_top_expenses(3) == [(20, 'abril', 2), (11, 'diciembre', 1), (9, 'octubre', 1)]
+
+    assert fin.get_expenses_between('Marzo', 'Agosto') == 2 + 3 + 20 + 4 + 5 + 6 + 7
+    assert fin.get_incomes_between(0, 0) == 1
+    savings = [sum(fin._ingresos[:i + 1]) + sum(fin._gastos[:i + 1]) for i in range(12)]
+    assert fin.get_running_savings() == savings
+
+    with pytest.raises(RowsNotRetained):
+        Finanzas().process_file('data.csv', separator=',').get_top_expenses(3)
+    with pytest.raises(ValueError):
+        fin.get_expenses_between('March', 'Agosto')
+    # Rangos al revés y posiciones que no son enteros de 0 a 11 tampoco son válidos
+    with pytest.raises(ValueError, match='first month'):
+        fin.get_expenses_between('Agosto', 'Marzo')
+    with pytest.raises(ValueError, match='first month'):
+        fin.get_incomes_between(5, 2)
+    for month in (12, -1, 1.5, True, None):
+        with pytest.raises(ValueError):
+            fin.get_incomes_between(month, 11)
+    assert fin.get_incomes_between(np.int64(0), 'enero') == 1
+    os.remove('data.csv')
+
+def test_batch_loaders_keep_retained_rows():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    for i in range(2):
+        with open(f'data_{i}.csv', 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow([i, -1, 2, 3, -4, 5, 6, 7, -8, 9, 10, i - 11])
+    files = ['data_0.csv', 'data_1.csv']
+
+    fin = asyncio.run(Finanzas(retain_rows=True).aprocess_file('data_0.csv', separator=','))
+    assert fin.get_top_expenses(1) == [(11, 'diciembre', 0)]
+
+    results, total = process_files(files, separator=',', max_workers=2, retain_rows=True)
+    assert results['data_1.csv'].get_top_expenses(1) == [(10, 'diciembre', 0)]
+    assert total.get_top_expenses(2) == [(11, 'diciembre', 0), (10, 'diciembre', 1)]
+
+    _, total = asyncio.run(aprocess_files(files, separator=',', retain_rows=True))
+    assert total.get_rows_totals(1, 2) == results['data_1.csv'].get_rows_totals(0, 1)
+    for file in files:
+        os.remove(file)
+
+def test_cube_rollups_match_finanzas():
+    def finanzas(gastos, ingresos):
+        fin = Finanzas()
+        for i in range(12):
+            fin._gastos[i] = gastos[i]
+            fin._ingresos[i] = ingresos[i]
+        fin._data_processed = True
+        return fin
+
+    results = {('ana', 2020): finanzas([-10] * 12, [20] * 12),
+               ('ana', 2021): finanzas([-5] * 12, [10] * 12),
+               ('luis', 2020): finanzas([-30] * 12, [30] * 12),
+               ('eva', 2021): False}
+    cube = CubeFinanzas.from_results(results)
+
+    assert cube.accounts == ['ana', 'luis'] and cube.years == [2020, 2021]
+    totals = cube.year_totals()
+    assert totals.loc[2020, 'year_expenses'] == 40 * 12
+    assert totals.loc[2021, 'year_incomes'] == 10 * 12
+    means = cube.month_means()
+    assert means.loc[2020, 'enero'] == 20 and means.loc[2021, 'diciembre'] == 5
+
+    ranking = cube.savings_ranking()
+    assert list(ranking['account']) == ['ana', 'luis']
+    assert ranking.loc[1, 'savings_rate'] == 100 * (30 - 15) / 30
+    assert list(cube.savings_ranking(2021)['account']) == ['ana']
+
+    fin = cube.get_account('ana', 2020)
+    assert fin.get_month_with_more_savings() == results[('ana', 2020)].get_month_with_more_savings()
+
+def test_cube_from_results_with_duplicate_keys():
+    # Dos ficheros de la misma cuenta y año se suman, y la celda tiene datos aunque el último no los tenga
+    loaded = Finanzas.from_bytes(bytes(8 * 24))
+    loaded._gastos[0] = -7
+    results = {'ana_2020_a.csv': loaded, 'ana_2020_b.csv': Finanzas(), 'luis_2020.csv': Finanzas()}
+    cube = CubeFinanzas.from_results(results, key=lambda name: tuple(name[:-len('.csv')].split('_')[:2]))
+
+    assert cube._loaded.tolist() == [[True], [False]]
+    assert cube.get_account('ana', '2020').is_data_loaded() is True
+    assert cube.get_account('ana', '2020')._gastos[0] == -7
+    assert cube.month_means().loc['2020', 'enero'] == 7
+
+def test_render_income_by_month_headless():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow([1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1])
+    fin = Finanzas().process_file('data.csv', separator=',')
+    other = Finanzas().process_file('data.csv', separator=',').merge(fin)
+    os.remove('data.csv')
+
+    image = fin.render_income_by_month()
+    assert image[:8] == b'\x89PNG\r\n\x1a\n'
+    assert fin.render_income_by_month('income.svg') == 'income.svg'
+    with open('income.svg', 'rb') as f:
+        assert b'<svg' in f.read(500)
+
+    images = render_incomes_by_month([fin, other, fin])
+    assert len(images) == 3
+    assert images[0] == images[2] == image
+    assert images[1] != image
+    assert render_incomes_by_month([fin, other], ['income_0.png', 'income_1.png']) == ['income_0.png', 'income_1.png']
+    for file in ['income.svg', 'income_0.png', 'income_1.png']:
+        os.remove(file)
+
+def test_import_is_fast_and_loads_no_heavy_dependencies():
+    # Presupuesto de tiempo de importación de finanzas (acumulado, en microsegundos, según -X importtime)
+    budget_us = 100000
+    code = ("import sys, finanzas\n"
+            "fin = finanzas.Finanzas.from_bytes(bytes(192))\n"
+            "fin.get_year_incomes()\n"
+            "print(sorted(m for m in ('numpy', 'pandas', 'matplotlib', 'asyncio', 'multiprocessing') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+    assert result.stdout.strip() == '[]'
+    line = [line for line in result.stderr.splitlines() if line.rstrip().endswith('| finanzas')][0]
+    assert int(line.split('|')[1]) < budget_us
+
+def test_cli_json_lines_for_directory(capsys):
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    os.makedirs('archive/2021', exist_ok=True)
+    for file in ['archive/a.csv', 'archive/2021/b.csv']:
+        with open(file, 'w', encoding='UTF8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerow([1, -6, 2, 3, 4, 5, 6, 5, 1, 9, 0, -1])
+
+    status = main.main(['archive', 'missing.csv', '--separator', ',', '--format', 'json', '--jobs', '1',
+                        '--chunk-size', '1', '--no-plot', '--total'])
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    expected = Finanzas().process_file('archive/a.csv', separator=',')
+
+    assert status == 1
+    assert [row['file'] for row in rows] == [os.path.join('archive', 'a.csv'),
+                                             os.path.join('archive', '2021', 'b.csv'), 'missing.csv', 'TOTAL']
+    assert rows[0]['year_incomes'] == expected.get_year_incomes()
+    assert rows[1]['month_with_more_expenses'] == expected.get_month_with_more_expenses()[1]
+    assert rows[2]['data_loaded'] is False and rows[2]['error'] == 'File not found'
+    assert rows[3]['year_expenses'] == 2 * expected.get_year_expenses()
+    shutil.rmtree('archive')
+
+def test_metrics_count_rows_cells_and_fallbacks():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    row1 = ["1.000,01", 1, "2", "3.1", 4.2, -5, "-6", "-7.9", "ups", 9, 10, 11]
+    row2 = ["", "-1.9'", "0", "NaN", 10, 0.432321, "1,1", "-2,1", -1, 0, -10, 11]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(row1)
+        writer.writerow(row2)
+
+    events = []
+    metrics = MetricsFinanzas(hook=lambda kind, name, value: events.append((kind, name, value)))
+    fin = Finanzas(metrics=metrics).process_file('data.csv', separator=',', chunksize=1)
+    fin.get_year_incomes()
+    fin.get_year_expenses()
+    snapshot = metrics.snapshot()
+
+    # Texto que no es entero: "1.000,01", "ups", "-1.9'", "1,1", "-2,1" y "-7.9", que está en una columna de texto
+    # (los decimales de columnas numéricas se truncan)
+    assert snapshot['counters'] == {'rows': 2, 'cells': 24, 'fallback_zero': 6}
+    assert set(snapshot['timers']) == {'read_csv', 'validate_header', 'coerce', 'accumulate', 'summary'}
+    assert snapshot['calls']['summary'] == 1
+    assert snapshot['calls']['coerce'] == 2
+    assert sum(value for kind, name, value in events if name == 'rows') == 2
+    assert ('timer', 'validate_header') in [(kind, name) for kind, name, _ in events]
+    assert Finanzas().process_file('data.csv', separator=',', chunksize=1)._gastos == fin._gastos
+    full = MetricsFinanzas()
+    Finanzas(metrics=full).process_file('data.csv', separator=',')
+    assert full.counters == snapshot['counters']
+    os.remove('data.csv')
+
+def test_metrics_in_aprocess_file_and_mmap():
+    header = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+              'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    rows = [["1.000,01", 1, "2", "3.1", 4.2, -5, "-6", "-7.9", "ups", 9, 10, 11],
+            ["", "-1.9'", "0", "NaN", 10, 0.432321, "1,1", "-2,1", -1, 0, -10, 11]]
+
+    with open('data.csv', 'w', encoding='UTF8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows * 3:
+            writer.writerow(row)
+            # Líneas en blanco: ni pandas ni el escaneo con mmap las cuentan como filas
+            f.write('\n  \n')
+
+    expected = MetricsFinanzas()
+    Finanzas(metrics=expected).process_file('data.csv', separator=',')
+    assert expected.counters['rows'] == 6
+
+    events = []
+    metrics = MetricsFinanzas(hook=lambda kind, name, value: events.append((kind, name, value)))
+    fin = asyncio.run(Finanzas(metrics=metrics).aprocess_file('data.csv', separator=','))
+    assert metrics.counters == expected.counters
+    assert metrics.calls == expected.calls
+    assert ('counter', 'rows', 6) in events
+    assert fin._metrics is metrics
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        metrics = MetricsFinanzas()
+        asyncio.run(Finanzas(metrics=metrics).aprocess_file('data.csv', separator=',', executor=pool))
+    assert metrics.counters == expected.counters
+
+    for block_size in (64, 1 << 22):
+        metrics = MetricsFinanzas()
+        Finanzas(metrics=metrics).process_file_mmap('data.csv', separator=',', block_size=block_size)
+        assert metrics.counters['rows'] == 6
+        assert metrics.counters['cells'] == 72
+    os.remove('data.csv')
+
 # Tested indirectly:
-# private methodd __convert_2_numeric_type(), is_data_loaded()
\ No newline at end of file
+# private methodd __convert_2_numeric_type(), is_data_loaded()
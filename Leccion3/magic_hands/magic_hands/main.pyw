@@ -1,6 +1,9 @@
 from utils import detectorDeManos as ddm
 from utils import reproducirNota as rn
+from utils import pipelineDeManos as pdm
+from utils import planificadorDeManos as plm
 import cv2
+import queue
 import time
 import tkinter as tk
 from tkinter import messagebox, StringVar
@@ -29,7 +32,22 @@ cam.set(4, hCam)
 
 ############################################################################
 # Iniciamos el detector de manos con un nivel alto de confianza de deteccion
-detector = ddm.detectorDeManos(confianzaDeteccion=0.8)
+# Modo ROI: MediaPipe sólo procesa la zona de las manos del frame anterior (reducida a como mucho roi_max_width
+# píxeles de ancho) y vuelve al frame completo cuando las pierde
+roi_mode = False
+roi_max_width = None
+detector = ddm.detectorDeManos(confianzaDeteccion=0.8, modoROI=roi_mode, anchoMaximo=roi_max_width)
+
+# Modo adaptativo: MediaPipe sólo se ejecuta cada N frames (o cuando hay movimiento) y entre medias las manos se
+# siguen con flujo óptico. N se ajusta solo para llegar a target_fps (ver planificadorDeManos)
+adaptive_mode = False
+target_fps = 25
+planificador = plm.planificadorDeManos(detector, fpsObjetivo=target_fps) if adaptive_mode else None
+
+# Modo pipeline: captura, inferencia, marcadores y pintado se ejecutan en hilos separados con colas acotadas
+# (ver pipelineDeManos), de modo que los FPS los marca la etapa más lenta y no la suma de todas
+pipelined_mode = False
+pipeline = pdm.pipelineDeManos(detector, cam, planificador=planificador).iniciar() if pipelined_mode else None
 
 # ##########################################################################
 # Variables para controlar lo que dibujaré en la imagen entre otras cosas
@@ -52,8 +70,9 @@ cTime = 0
 pTime = 0
 
 def show_frames():
-    global cTime
-    global pTime
+    if pipelined_mode:
+        show_pipeline_frames()
+        return
 
     # Leemos una imagen de la cámara
     try:
@@ -66,17 +85,43 @@ def show_frames():
     # landmarks para poder detectar la nota que estamos tocando.
     # Primero se detectan cuantas manos hay en la escena y posteriormente
     # se detecta la nota tocada con cada mano.
-    img_result = detector.detectarManos(img, display_hand_skel)
-    # Primera mano
-    lmList1 = detector.detectarPosicion(img, 0)
-    notas = detector.detectarNotas(lmList1, 0)
-    player.play(notas, note_duration, note_detections_delay, mute_output)
-    detector.pintarNotas(img, lmList1, 0, display_notes_identifiers)
-    # Segunda mano
-    lmList2 = detector.detectarPosicion(img, 1)
-    notas = detector.detectarNotas(lmList2, 1)
-    player.play(notas, note_duration, note_detections_delay, mute_output)
-    detector.pintarNotas(img, lmList2, 1, display_notes_identifiers)
+    img_result = (planificador or detector).detectarManos(img, display_hand_skel)
+    # Dedos de las dos manos que tocan su nota. Se calculan sobre los buffers del detector, así que por frame no
+    # se crean listas de marcadores ni de notas salvo cuando suena alguna
+    tocadas = detector.detectarTocadasManos(img)
+    for mano in (0, 1):
+        if tocadas[mano].any():
+            notas = ddm.TABLA_NOTAS[mano][tocadas[mano]].tolist()
+            player.play(notas, note_duration, note_detections_delay, mute_output)
+        if display_notes_identifiers:
+            detector.pintarNotas(img, detector.detectarPosicionArray(img, mano), mano, True)
+    show_image(img)
+
+def show_pipeline_frames():
+    # Las opciones de pintado se pasan al pipeline, que pinta en su propio hilo
+    pipeline.dibujarEsqueleto = display_hand_skel
+    pipeline.dibujarNotas = display_notes_identifiers
+    try:
+        resultado = pipeline.obtenerResultado(timeout=0)
+    except queue.Empty:
+        # Todavía no hay un frame nuevo procesado
+        handler_video.after(1, show_frames)
+        return
+    except Exception as error:
+        # Alguna etapa del pipeline ha fallado
+        messagebox.showinfo("Error", f"Hand detection failed ({error!r}). The progam will terminate")
+        return
+    if resultado is None:
+        messagebox.showinfo("Error", "Video input not detected. The progam will terminate")
+        return
+    # El reproductor se usa desde el hilo de la interfaz, igual que en el modo normal
+    for notas in resultado.notas:
+        player.play(notas, note_duration, note_detections_delay, mute_output)
+    show_image(resultado.img)
+
+def show_image(img):
+    global cTime
+    global pTime
 
     # #######################################################################
     # Calculo el framerate para mostrarlo en la imagen de forma opcional
@@ -86,6 +131,11 @@ def show_frames():
     if display_fps:
         cv2.putText(img, f"FPS: {str(int(fps))}", (10, 70),
                     cv2.FONT_HERSHEY_PLAIN, 3, (255, 0, 255), 3)
+        if planificador is not None:
+            # Inferencias completas de MediaPipe por segundo (el resto de frames se siguen con flujo óptico)
+            inferencias = planificador.estadisticas()['inferencias_por_segundo']
+            cv2.putText(img, f"Inferencias/s: {int(inferencias or 0)} (cada {planificador.intervalo})", (10, 110),
+                        cv2.FONT_HERSHEY_PLAIN, 2, (255, 0, 255), 2)
 
     # #######################################################################
     # Represento la imagen en el label (handler_video).
@@ -1,9 +1,22 @@
 import cv2
 import mediapipe as mp
+import numpy as np
 import time
 import math
 
 
+# Tabla de notas: fila = mano, columna = dedo (índice, corazón, anular y meñique). El meñique de la segunda mano
+# no tiene nota asignada
+PULGAR = 4
+PUNTAS_DEDOS = np.array([8, 12, 16, 20])
+# Las mismas puntas como slice: indexar con él da una vista del array de marcadores, sin copiarlo
+PUNTAS = slice(8, 21, 4)
+TABLA_NOTAS = np.array([["Do", "Re", "Mi", "Fa"],
+                        ["Sol", "La", "Si", ""]], dtype=object)
+NOTAS_ASIGNADAS = TABLA_NOTAS != ""
+# Para cada mano, nota de cada punta de dedo que tiene nota asignada ({id del marcador: nota})
+NOTA_POR_PUNTA = tuple({int(id): nota for id, nota in zip(PUNTAS_DEDOS, notas) if nota} for notas in TABLA_NOTAS)
+
 
 class detectorDeManos():
     """
@@ -31,34 +44,69 @@ class detectorDeManos():
                                                     confianzaDeteccion, entonces nos evitamos seguir detectando la
                                                     mano y solo hacemos tracking, para disminuir la carga de procesado
     confianzaTracking   0.5                         Umbral de confianza del seguimiento de los dedos
+    umbralNotas         0.0375                      Distancia máxima entre el pulgar y la punta de un dedo para tocar
+                                                    su nota, como fracción de la diagonal de la imagen (0.0375 son
+                                                    30 píxeles a 640x480)
+    modoROI             False                       Si es True, MediaPipe sólo procesa la región de la imagen donde
+                                                    estaban las manos en el frame anterior (con un margen), en lugar
+                                                    del frame completo. Si en esa región no se encuentran manos se
+                                                    vuelve a buscar en el frame completo. Como la imagen que recibe
+                                                    MediaPipe cambia de encuadre, en este modo se usa siempre
+                                                    static_image_mode=True (ver inferirManos())
+    margenROI           0.5                         Margen alrededor de las manos, como fracción del tamaño de su
+                                                    rectángulo
+    refrescoROI         30                          Cada cuántos frames se busca en el frame completo aunque haya
+                                                    manos en la región (por si entra otra mano)
+    anchoMaximo         None                        Si se indica, la imagen (o la región) se reduce a este ancho en
+                                                    píxeles antes de la inferencia
     mpHands             mp.solutions.hands          Modelo de mano
     mpDraw              mp.solutions.drawing_utils  Permite dibujar marcadores y otros elementos del modelo de manos
     hands               mpHands.Hands()             Detector de manos
     ==================  =========================== ==================================================================
 
 
-    =================  ========================  =====================================================================
-    Métodos            Parámetros                Comentario
-    =================  ========================  =====================================================================
-    detectarManos      img                       Intenta detectar las manos en una escena a partir de un frame (img).
-                       draw                      Si draw==True, el método devuelve la imagen con los marcadores
-                                                 pintados sobre las manos detectadas y unidos por líneas rectas.
-                                                 Al ejecutar este método se guardan internamente los marcadores de los
-                                                 dedos
-    detectarPosicion   img                       Luego de ejecutar detectarManos(), detectarPosicion() devuelve para
-                       mano                      la mano indicada por parámetro, una lista de marcadores con la
-                                                 siguiente información: id de marcador, cordenada x, coordenada y.
-    detectarNotas      lmList                    Mide el módulo (distancia) entre el índice de la mano indicada (mano)
-                       mano                      y los dedos restantes (4 dedos si es la primera mano, 3 si es la
-                                                 segunda, ya que trabajamos sólo con  notas musicales) utilizando la
-                                                 lista de marcadores que pasamos por parámetro (lmList), para decidir
-                                                 qué nota se está tocando (cada dedo excepto el pulgar representa una
-                                                 nota mayor)
-    pintarNotas        img                       Sirve para mostrar por pantalla al usuario las notas asignadas
-                       lmList                    a cada dedo de cada mano
-                       mano
-                       draw
-    =================  ========================  =====================================================================
+    =====================  ========================  =====================================================================
+    Métodos                Parámetros                Comentario
+    =====================  ========================  =====================================================================
+    detectarManos          img                       Intenta detectar las manos en una escena a partir de un frame (img).
+                           draw                      Si draw==True, el método devuelve la imagen con los marcadores
+                                                     pintados sobre las manos detectadas y unidos por líneas rectas.
+                                                     Al ejecutar este método se guardan internamente los marcadores de los
+                                                     dedos
+    inferirManos           img                       Ejecuta sólo la inferencia de MediaPipe y devuelve los resultados sin
+                                                     guardarlos, para poder procesar varios frames a la vez (pipeline)
+    dibujarManos           img                       Dibuja el modelo de mano de unos resultados de inferirManos()
+                           resultados
+    detectarPosicion       img                       Luego de ejecutar detectarManos(), detectarPosicion() devuelve para
+                           mano                      la mano indicada por parámetro, una lista de marcadores con la
+                           resultados                siguiente información: id de marcador, cordenada x, coordenada y.
+                                                     Con resultados se usan los de inferirManos() en lugar de los
+                                                     guardados por detectarManos()
+    detectarPosicionArray  img                       Igual que detectarPosicion() pero devuelve un array de NumPy (21, 2)
+                           mano                      con las coordenadas x e y en píxeles (la fila es el id del marcador),
+                           resultados                o (21, 3) en coma flotante con la profundidad z si profundidad==True.
+                           profundidad               El array se reutiliza en cada frame: hay que copiarlo para guardarlo
+    detectarNotas          lmList                    Mide el módulo (distancia) entre el índice de la mano indicada (mano)
+                           mano                      y los dedos restantes (4 dedos si es la primera mano, 3 si es la
+                                                     segunda, ya que trabajamos sólo con  notas musicales) utilizando la
+                                                     lista de marcadores que pasamos por parámetro (lmList), para decidir
+                                                     qué nota se está tocando (cada dedo excepto el pulgar representa una
+                                                     nota mayor)
+    detectarNotasArray     posiciones                Versión vectorizada de detectarNotas(): calcula a la vez las
+                           diagonal                  distancias del pulgar a las cuatro puntas de los dedos de una o
+                           manos                     varias manos (arrays (21, 2) o (n, 21, 2)) y consulta la tabla de
+                                                     notas. Devuelve una lista de notas por mano
+    detectarNotasManos     img                       Notas de las dos manos de la escena en una sola llamada
+                           resultados
+    detectarTocadasManos   img                       Como detectarNotasManos(), pero devuelve un array (2, 4) de booleanos
+                           resultados                con los dedos de cada mano que tocan su nota (en el orden de
+                                                     TABLA_NOTAS). El array se reutiliza en cada frame
+    pintarNotas            img                       Sirve para mostrar por pantalla al usuario las notas asignadas
+                           lmList                    a cada dedo de cada mano (lmList puede ser también el array de
+                                                     detectarPosicionArray())
+                           mano
+                           draw
+    =====================  ========================  =====================================================================
 
     Ejemplos:
     ===========
@@ -76,20 +124,51 @@ class detectorDeManos():
 
     """
     def __init__(self, modo_estatico=False, num_manos=2,
-                 confianzaDeteccion=0.5, confianzaTracking=0.5):
+                 confianzaDeteccion=0.5, confianzaTracking=0.5, umbralNotas=0.0375,
+                 modoROI=False, margenROI=0.5, refrescoROI=30, anchoMaximo=None):
         self.modo_estatico = modo_estatico
         self.num_manos = num_manos
         self.confianzaDeteccion = confianzaDeteccion
         self.confianzaTracking = confianzaTracking
-        # Inicializo el detector de manos
+        self.umbralNotas = umbralNotas
+        self.modoROI = modoROI
+        self.margenROI = margenROI
+        self.refrescoROI = refrescoROI
+        self.anchoMaximo = anchoMaximo
+        # Región (x0, y0, x1, y1) en píxeles donde se buscarán las manos en el siguiente frame (None = frame completo)
+        # y frames procesados desde la última búsqueda en el frame completo
+        self._roi = None
+        self._framesROI = 0
+        # Buffers de la imagen reducida y de la imagen RGB que se pasa a MediaPipe. Se reutilizan mientras no cambie el
+        # tamaño de la imagen (o de la región), así que con la cámara a resolución fija no se reserva memoria por frame
+        self._reducida = None
+        self._rgb = None
+        # Inicializo el detector de manos. Con modoROI cada frame se trata como una imagen independiente: el
+        # seguimiento de MediaPipe en modo vídeo parte de los marcadores del frame anterior en coordenadas de la
+        # imagen que recibió, y al cambiar el recorte (o pasar del recorte al frame completo) ese punto de partida
+        # estaría en otro sitio
         self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(static_image_mode=self.modo_estatico,
+        self.hands = self.mpHands.Hands(static_image_mode=self.modo_estatico or self.modoROI,
                                         max_num_hands=self.num_manos,
                                         min_detection_confidence=self.confianzaDeteccion,
                                         min_tracking_confidence=self.confianzaTracking)
         # Sirve para jugar con el modelo de mano y pintar las landmarks o
         # trazar líneas entre ellas
         self.mpDraw = mp.solutions.drawing_utils
+        # Buffers de detectarPosicionArray(), uno por mano, que se reutilizan frame a frame para no reservar memoria:
+        # coordenadas normalizadas (x, y, z), escaladas a píxeles y enteras
+        self._normalizados = np.zeros((max(self.num_manos, 2), 21, 3), dtype=np.float64)
+        self._escalados = np.zeros_like(self._normalizados)
+        self._pixeles = np.zeros((max(self.num_manos, 2), 21, 2), dtype=np.int32)
+        self._escala = np.ones(3, dtype=np.float64)
+        # Manos presentes en el frame para detectarNotasManos()
+        self._presentes = np.zeros(2, dtype=bool)
+        # Buffers de detectarNotasArray(): vectores pulgar -> punta, distancias y dedos que tocan nota de cada mano
+        self._vectores = np.zeros((max(self.num_manos, 2), 4, 2), dtype=np.float64)
+        self._distancias = np.zeros((max(self.num_manos, 2), 4), dtype=np.float64)
+        self._tocadas = np.zeros((max(self.num_manos, 2), 4), dtype=bool)
+        # Diagonal (en píxeles) del último frame procesado, para escalar umbralNotas. Por defecto, la de 640x480
+        self._diagonal = 800.0
 
     def detectarManos(self, img, draw=False):
         """
@@ -99,63 +178,181 @@ class detectorDeManos():
         :param img: Frame de la escena donde detectaremos la mano
         :param draw: Si es True dibuja el modelo de mano sobre la escena
         """
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
+        self.results = self.inferirManos(img)
+        if draw:
+            self.dibujarManos(img, self.results)
+        return img
+
+    def inferirManos(self, img):
+        """
+        Convierte el frame de BGR a RGB y ejecuta el detector de manos de MediaPipe. A diferencia de detectarManos()
+        no guarda los resultados en el detector, de modo que la inferencia de un frame puede hacerse en un hilo
+        mientras otro extrae los marcadores del frame anterior.
+
+        Con modoROI sólo se procesa la región de las manos del frame anterior y con anchoMaximo la imagen se reduce
+        antes de la inferencia. En ambos casos los marcadores se devuelven en coordenadas del frame completo.
+        Con modoROI MediaPipe funciona en modo imagen estática (detecta las manos en cada recorte en lugar de
+        seguirlas desde el frame anterior), porque su seguimiento supone que todos los frames tienen el mismo
+        encuadre; lo que se ahorra es el tamaño de la imagen procesada. Reducir con anchoMaximo no cambia el
+        encuadre y conserva el modo vídeo.
+        La imagen RGB (y la reducida) se escriben en buffers del detector que se reutilizan de un frame a otro.
+
+        :param img: Frame de la escena donde detectaremos la mano
+        :return: resultados de MediaPipe (multi_hand_landmarks, multi_handedness)
+        """
+        if not self.modoROI:
+            return self.__procesar(img, None)
+
+        self._framesROI += 1
+        if self._roi is not None and self._framesROI < self.refrescoROI:
+            resultados = self.__procesar(img, self._roi)
+            if resultados.multi_hand_landmarks:
+                self.__actualizarROI(img, resultados)
+                return resultados
+        # Sin región, región sin manos (seguimiento perdido) o toca refrescar: búsqueda en el frame completo
+        self._framesROI = 0
+        resultados = self.__procesar(img, None)
+        self.__actualizarROI(img, resultados)
+        return resultados
+
+    def __procesar(self, img, roi):
+        # Recorta la región (x0, y0, x1, y1) si la hay, reduce la imagen a anchoMaximo si hace falta, ejecuta MediaPipe
+        # y lleva los marcadores (normalizados respecto a la imagen procesada) al frame completo
+        heigth, width = img.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, width, heigth)
+        recorte = img[y0:y1, x0:x1]
+        if self.anchoMaximo is not None and x1 - x0 > self.anchoMaximo:
+            escala = self.anchoMaximo / (x1 - x0)
+            tamaño = (self.anchoMaximo, max(1, round((y1 - y0) * escala)))
+            self._reducida = cv2.resize(recorte, tamaño, dst=self.__buffer(self._reducida, tamaño[::-1], img),
+                                        interpolation=cv2.INTER_AREA)
+            recorte = self._reducida
+        self._rgb = cv2.cvtColor(recorte, cv2.COLOR_BGR2RGB, dst=self.__buffer(self._rgb, recorte.shape[:2], img))
+        # Marcada como de sólo lectura, MediaPipe usa la imagen por referencia en lugar de copiarla
+        self._rgb.flags.writeable = False
+        resultados = self.hands.process(self._rgb)
+        if roi is not None and resultados.multi_hand_landmarks:
+            for mano in resultados.multi_hand_landmarks:
+                for landmark in mano.landmark:
+                    landmark.x = (x0 + landmark.x * (x1 - x0)) / width
+                    landmark.y = (y0 + landmark.y * (y1 - y0)) / heigth
+                    # z está en la escala de x (ancho de la imagen procesada)
+                    landmark.z = landmark.z * (x1 - x0) / width
+        return resultados
 
-        if self.results.multi_hand_landmarks:
-            for handLandmarks in self.results.multi_hand_landmarks:
-                if draw:
-                    self.mpDraw.draw_landmarks(img, handLandmarks,
-                                               self.mpHands.HAND_CONNECTIONS)
+    @staticmethod
+    def __buffer(buffer, forma, img):
+        # Devuelve el buffer si tiene la forma (alto, ancho) pedida, listo para escribir en él, o uno nuevo si no
+        forma = tuple(forma) + img.shape[2:]
+        if buffer is None or buffer.shape != forma:
+            return np.empty(forma, dtype=img.dtype)
+        buffer.flags.writeable = True
+        return buffer
+
+    def __actualizarROI(self, img, resultados):
+        if not resultados.multi_hand_landmarks:
+            self._roi = None
+            return
+        heigth, width = img.shape[:2]
+        puntos = np.array([(landmark.x * width, landmark.y * heigth) for mano in resultados.multi_hand_landmarks
+                           for landmark in mano.landmark])
+        (bx0, by0), (bx1, by1) = puntos.min(axis=0), puntos.max(axis=0)
+        # La región sólo cambia cuando las manos se salen de ella: así MediaPipe recibe una imagen estable y puede
+        # seguir las manos entre frames en lugar de volver a detectarlas
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            if x0 <= bx0 and y0 <= by0 and bx1 <= x1 and by1 <= y1:
+                return
+        # Región cuadrada alrededor de las manos con el margen, recortada a los bordes de la imagen
+        lado = max(bx1 - bx0, by1 - by0) * (1 + 2 * self.margenROI)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0, y0 = max(0, int(cx - lado / 2)), max(0, int(cy - lado / 2))
+        x1, y1 = min(width, int(math.ceil(cx + lado / 2))), min(heigth, int(math.ceil(cy + lado / 2)))
+        self._roi = (x0, y0, x1, y1) if x1 - x0 > 1 and y1 - y0 > 1 else None
+
+    def dibujarManos(self, img, resultados):
+        """
+        Dibuja sobre la escena los marcadores de las manos detectadas, unidos por líneas rectas.
+
+        :param img: Frame de la escena donde dibujaremos el modelo de mano
+        :param resultados: resultados devueltos por inferirManos()
+        """
+        if resultados.multi_hand_landmarks:
+            for handLandmarks in resultados.multi_hand_landmarks:
+                self.mpDraw.draw_landmarks(img, handLandmarks,
+                                           self.mpHands.HAND_CONNECTIONS)
         return img
 
-    def detectarPosicion(self, img, mano=0):
+    def detectarPosicion(self, img, mano=0, resultados=None):
         """
         Devuelve una lista de marcadores con sus respectivos IDs asi como sus coordenadas x e y.
 
         :param img: imagen de la escena que contiene los marcadores, de la cual se extraen las dimensiones
         :param mano: Mano activa (0 o 1)
+        :param resultados: resultados de inferirManos(). Por defecto, los guardados por detectarManos()
         :return: lmList (listado de landmarks o marcadores para la mano indicada con sus respectivas cordenadas x e y)
         """
-        lmList = []
-        if self.results.multi_hand_landmarks:
-            try:
-                manoActiva = self.results.multi_hand_landmarks[mano]
-                for id, landmark in enumerate(manoActiva.landmark):
-                    heigth, width, channel = img.shape
-                    cx, cy = int(landmark.x*width), int(landmark.y*heigth)
-                    lmList.append([id, cx, cy])
-            except IndexError:
-                # He quitado los prints para intentar ganar FPSs.....
-                # print("Error de índice."+"Probablemente no hay una segunda mano en la escena")"
-                pass
-        return lmList
+        posiciones = self.detectarPosicionArray(img, mano, resultados)
+        if posiciones is None:
+            return []
+        return [[id, cx, cy] for id, (cx, cy) in enumerate(posiciones.tolist())]
+
+    def detectarPosicionArray(self, img, mano=0, resultados=None, profundidad=False):
+        """
+        Versión vectorizada de detectarPosicion(): convierte los 21 marcadores de la mano de una vez en un array de
+        NumPy, sin crear una lista por marcador. El array devuelto es un buffer interno que se sobrescribe en la
+        siguiente llamada para la misma mano, así que hay que copiarlo (.copy()) si se quiere conservar.
+
+        :param img: imagen de la escena que contiene los marcadores, de la cual se extraen las dimensiones
+        :param mano: Mano activa (0 o 1)
+        :param resultados: resultados de inferirManos(). Por defecto, los guardados por detectarManos()
+        :param profundidad: Si es True devuelve (21, 3) en coma flotante con x, y en píxeles y z en la misma escala que x
+        :return: array (21, 2) de enteros con x e y en píxeles (fila = id del marcador), (21, 3) si profundidad, o
+                 None si la mano no está en la escena
+        """
+        if resultados is None:
+            resultados = self.results
+        if not resultados.multi_hand_landmarks:
+            return None
+        try:
+            manoActiva = resultados.multi_hand_landmarks[mano]
+        except IndexError:
+            # No hay una segunda mano en la escena
+            return None
+        # Se escribe fila a fila en el buffer de la mano, sin crear un array intermedio
+        normalizados = self._normalizados[mano]
+        for id, landmark in enumerate(manoActiva.landmark):
+            normalizados[id] = landmark.x, landmark.y, landmark.z
+        heigth, width = img.shape[:2]
+        self._diagonal = math.hypot(width, heigth)
+        self._escala[0], self._escala[1], self._escala[2] = width, heigth, width
+        escalados = np.multiply(normalizados, self._escala, out=self._escalados[mano])
+        if profundidad:
+            return escalados
+        # La conversión a entero trunca hacia cero, igual que int(landmark.x*width)
+        pixeles = self._pixeles[mano]
+        np.copyto(pixeles, escalados[:, :2], casting='unsafe')
+        return pixeles
 
     def pintarNotas(self, img,  lmList, mano=0, draw=False):
         """
 
         :param img: Frame de la escena donde pintaremos las notas
-        :param lmList: Lista de marcadores devueltos por detectarPosicion()
+        :param lmList: Lista de marcadores devueltos por detectarPosicion() o array de detectarPosicionArray()
         :param mano: Mano activa (0 o 1)
         :param draw: Si es True dibuja las notas sobre cada dedo en la escena
         """
-        notasMano1 = ["Do", "Re", "Mi", "Fa"]
-        notasMano2 = ["Sol", "La", "Si"]
-        for landmark in lmList:
-            if mano == 0:
-                if draw and landmark[0] % 4 == 0 and landmark[0] > 4:
-                    cv2.circle(img, (landmark[1], landmark[2]), 5,
-                               (255, 0, 255), cv2.FILLED)
-                    cv2.putText(img, notasMano1[(int(landmark[0]/5))-1],
-                                (landmark[1], landmark[2]),
-                                cv2.FONT_HERSHEY_PLAIN, 3, (0, 255, 0), 3)
-            if mano == 1:
-                if draw and landmark[0] % 4 == 0 and landmark[0] > 4 and landmark[0] < 20:
-                    cv2.circle(img, (landmark[1], landmark[2]), 5,
-                               (255, 0, 255), cv2.FILLED)
-                    cv2.putText(img, notasMano2[(int(landmark[0]/4))-2],
-                                (landmark[1], landmark[2]),
-                                cv2.FONT_HERSHEY_PLAIN, 3, (0, 255, 0), 3)
+        if not draw or mano not in (0, 1) or lmList is None or len(lmList) == 0:
+            return
+        # Sólo las puntas de los dedos con nota asignada, con las notas de TABLA_NOTAS. La fila de cada marcador es
+        # su id tanto en la lista ([id, x, y]) como en el array ([x, y])
+        for id, nota in NOTA_POR_PUNTA[mano].items():
+            cx, cy = lmList[id][-2:]
+            cv2.circle(img, (int(cx), int(cy)), 5,
+                       (255, 0, 255), cv2.FILLED)
+            cv2.putText(img, nota,
+                        (int(cx), int(cy)),
+                        cv2.FONT_HERSHEY_PLAIN, 3, (0, 255, 0), 3)
 
     def detectarNotas(self, lmList, mano=0):
         """
@@ -167,27 +364,74 @@ class detectorDeManos():
         :param mano: Mano activa (0 o 1)
         :return: Lista de notas detectadas
         """
-        notas = []
-        notasMano1 = ["Do", "Re", "Mi", "Fa"]
-        notasMano2 = ["Sol", "La", "Si"]
-
-        for landmark in lmList:
-            if landmark[0] == 4:
-                x1, y1 = landmark[1], landmark[2]
-            try:
-                if mano == 0:
-                    if landmark[0] % 4 == 0 and landmark[0] > 4:
-                        x2, y2 = landmark[1], landmark[2]
-                        length = math.hypot(x2 - x1, y2 - y1)
-                        if length < 30:
-                            notas.append(notasMano1[(int(landmark[0]/5))-1])
-                if mano == 1:
-                    if landmark[0] % 4 == 0 and landmark[0] > 4 and landmark[0] < 20:
-                        x2, y2 = landmark[1], landmark[2]
-                        length = math.hypot(x2 - x1, y2 - y1)
-                        if length < 30:
-                            notas.append(notasMano2[(int(landmark[0]/4))-2])
-            except IndexError:
-                # print(f"Error de índice. No se detecta el pulgar (x1, x2)")
-                pass
-        return notas
+        # Sólo hay notas asignadas a dos manos
+        if not lmList or mano not in (0, 1):
+            return []
+        posiciones = np.array(lmList)[:, 1:3]
+        return self.detectarNotasArray(posiciones, manos=[mano])[0]
+
+    def detectarNotasArray(self, posiciones, diagonal=None, manos=None):
+        """
+        Versión vectorizada de detectarNotas(): calcula de una vez las distancias entre el pulgar (marcador 4) y las
+        puntas de los dedos (8, 12, 16 y 20) de todas las manos indicadas y las compara con el umbral. Las notas se
+        toman de TABLA_NOTAS, sin recorrer los marcadores uno a uno.
+
+        :param posiciones: array (21, 2) de una mano o (n, 21, 2) de n manos, como los de detectarPosicionArray()
+        :param diagonal: diagonal de la imagen en píxeles para escalar umbralNotas. Por defecto, la del último frame
+                         procesado por detectarPosicionArray()
+        :param manos: mano (0 o 1) de cada fila de posiciones. Por defecto 0, 1, ... en orden
+        :return: lista con la lista de notas detectadas de cada mano
+        """
+        posiciones = np.asarray(posiciones)
+        if posiciones.ndim == 2:
+            posiciones = posiciones[np.newaxis]
+        manos = np.arange(len(posiciones)) if manos is None else np.asarray(manos)
+        tocadas = self.__tocadas(posiciones, diagonal, NOTAS_ASIGNADAS[manos])
+        return [TABLA_NOTAS[mano][tocadas[i]].tolist() for i, mano in enumerate(manos)]
+
+    def __tocadas(self, posiciones, diagonal, asignadas):
+        # Máscara (n, 4) de las puntas de dedo (en el orden de TABLA_NOTAS) que tocan su nota en cada mano;
+        # asignadas son las filas de NOTAS_ASIGNADAS de esas manos
+        umbral = self.umbralNotas * (self._diagonal if diagonal is None else diagonal)
+        n = len(posiciones)
+        if n <= len(self._tocadas):
+            # Caso habitual (hasta num_manos manos): los cálculos intermedios se escriben en los buffers del detector
+            vectores, distancias, tocadas = self._vectores[:n], self._distancias[:n], self._tocadas[:n]
+        else:
+            vectores, distancias, tocadas = np.empty((n, 4, 2)), np.empty((n, 4)), np.empty((n, 4), dtype=bool)
+        np.subtract(posiciones[:, PUNTAS, :2], posiciones[:, PULGAR, np.newaxis, :2], out=vectores)
+        np.hypot(vectores[..., 0], vectores[..., 1], out=distancias)
+        np.less(distancias, umbral, out=tocadas)
+        tocadas &= asignadas
+        return tocadas
+
+    def detectarNotasManos(self, img, resultados=None):
+        """
+        Detecta las notas que se tocan con las dos manos de la escena en una sola llamada.
+
+        :param img: imagen de la escena que contiene los marcadores, de la cual se extraen las dimensiones
+        :param resultados: resultados de inferirManos(). Por defecto, los guardados por detectarManos()
+        :return: [notas de la primera mano, notas de la segunda mano] (listas vacías si la mano no está)
+        """
+        tocadas = self.detectarTocadasManos(img, resultados)
+        return [TABLA_NOTAS[mano][tocadas[mano]].tolist() for mano in (0, 1)]
+
+    def detectarTocadasManos(self, img, resultados=None):
+        """
+        Detecta qué dedos de las dos manos de la escena tocan su nota, sin traducirlos a nombres de nota. El array
+        devuelto es un buffer interno que se sobrescribe en la siguiente llamada, así que hay que copiarlo (.copy())
+        si se quiere conservar.
+
+        :param img: imagen de la escena que contiene los marcadores, de la cual se extraen las dimensiones
+        :param resultados: resultados de inferirManos(). Por defecto, los guardados por detectarManos()
+        :return: array (2, 4) de booleanos, una fila por mano y una columna por dedo (índice, corazón, anular y
+                 meñique), con las notas de TABLA_NOTAS. Las filas de las manos que no están son False
+        """
+        presentes = self._presentes
+        for mano in (0, 1):
+            presentes[mano] = self.detectarPosicionArray(img, mano, resultados) is not None
+        # Se calculan las dos manos sobre los buffers de píxeles (el de una mano ausente tiene datos de otro frame)
+        # y se descartan con la máscara de manos presentes, sin copiar las manos presentes a un array nuevo
+        tocadas = self.__tocadas(self._pixeles[:2], None, NOTAS_ASIGNADAS)
+        np.logical_and(tocadas, presentes[:, np.newaxis], out=tocadas)
+        return tocadas
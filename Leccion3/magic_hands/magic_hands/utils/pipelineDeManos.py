@@ -0,0 +1,221 @@
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+
+# Resultado de un frame a la salida del pipeline
+resultadoFrame = namedtuple('resultadoFrame', ['id', 'timestamp', 'img', 'lmLists', 'notas'])
+
+
+class colaDescartaAntiguos():
+    """
+    colaDescartaAntiguos. Cola acotada entre dos etapas del pipeline. Si la etapa siguiente va más lenta y la cola
+    está llena, al insertar un elemento nuevo se descarta el más antiguo en lugar de bloquear a la etapa anterior.
+    Así la latencia queda acotada: siempre se procesa el frame más reciente disponible.
+
+    ==================  =========================== ==================================================================
+    Atributos           Valor por defecto           Comentarios
+    ==================  =========================== ==================================================================
+    maxsize             2                           Número máximo de elementos en la cola
+    descartados         0                           Número de elementos descartados por estar la cola llena
+    ==================  =========================== ==================================================================
+    """
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.descartados = 0
+        self._elementos = deque()
+        self._cerrada = False
+        self._condicion = threading.Condition()
+
+    def put(self, elemento):
+        """
+        Inserta un elemento. Si la cola está llena se descarta el más antiguo.
+
+        :param elemento: elemento a insertar
+        """
+        with self._condicion:
+            if len(self._elementos) >= self.maxsize:
+                self._elementos.popleft()
+                self.descartados += 1
+            self._elementos.append(elemento)
+            self._condicion.notify()
+
+    def get(self, timeout=None):
+        """
+        Extrae el elemento más antiguo esperando como mucho timeout segundos (None = sin límite).
+
+        :param timeout: tiempo máximo de espera en segundos
+        :return: el elemento, o None si la cola está cerrada y vacía
+        :raises queue.Empty: si se agota el tiempo de espera
+        """
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._elementos or self._cerrada, timeout):
+                raise queue.Empty
+            if not self._elementos:
+                return None
+            return self._elementos.popleft()
+
+    def close(self):
+        """
+        Cierra la cola: cuando se vacíe, get() devolverá None para que la etapa siguiente termine.
+        """
+        with self._condicion:
+            self._cerrada = True
+            self._condicion.notify_all()
+
+
+class pipelineDeManos():
+    """
+    pipelineDeManos. Ejecuta la detección de manos como un pipeline de cuatro etapas, cada una en su propio hilo y
+    conectadas por colas acotadas (colaDescartaAntiguos):
+
+    1. captura: lee frames de la fuente (p.ej. cv2.VideoCapture)
+    2. inferencia: detector.inferirManos() (conversión BGR→RGB y MediaPipe)
+    3. marcadores: detector.detectarPosicion() y detector.detectarNotas() para cada mano
+    4. pintado: modelo de mano y notas sobre el frame
+
+    De este modo el tiempo por frame lo marca la etapa más lenta (normalmente la inferencia) y no la suma de todas.
+    Si la inferencia se queda atrás, las colas descartan los frames más antiguos y la latencia no crece.
+    Los frames ya procesados se recogen con obtenerResultado() (p.ej. desde el bucle de la interfaz gráfica, que
+    es quien debe mostrar la imagen y reproducir las notas). Si una etapa lanza una excepción, el pipeline se para
+    y obtenerResultado() la relanza cuando se acaban los frames ya procesados.
+
+    ==================  =========================== ==================================================================
+    Atributos           Valor por defecto           Comentarios
+    ==================  =========================== ==================================================================
+    detector            (requerido)                 detectorDeManos que se usará en la etapa de inferencia
+    fuente              (requerido)                 Objeto con read() -> (success, img), p.ej. cv2.VideoCapture
+    tamCola             2                           Tamaño máximo de cada cola entre etapas
+    dibujarEsqueleto    False                       Dibuja el modelo de mano en la etapa de pintado
+    dibujarNotas        True                        Dibuja las notas de cada dedo en la etapa de pintado
+    planificador        None                        planificadorDeManos opcional: la etapa de inferencia sólo ejecuta
+                                                    MediaPipe cuando él lo decide y el resto de frames sigue las manos
+    ==================  =========================== ==================================================================
+
+    =================  ========================  =====================================================================
+    Métodos            Parámetros                Comentario
+    =================  ========================  =====================================================================
+    iniciar                                      Arranca los hilos de las cuatro etapas
+    detener                                      Para la captura y espera a que terminen los hilos
+    obtenerResultado   timeout                   Devuelve el siguiente resultadoFrame (id, timestamp, img, lmLists,
+                                                 notas) o None si el pipeline ha terminado. Relanza el error de la
+                                                 etapa que haya fallado
+    descartados                                  Frames descartados en cada cola por ir la etapa siguiente lenta
+    =================  ========================  =====================================================================
+
+    Ejemplos:
+    ===========
+    >>> pipeline = pipelineDeManos(ddm.detectorDeManos(confianzaDeteccion=0.8), cv2.VideoCapture(0))
+    >>> pipeline.iniciar()
+    >>> resultado = pipeline.obtenerResultado(timeout=1)
+    >>> player.play(resultado.notas[0], note_duration, note_detections_delay, mute_output)
+    >>> pipeline.detener()
+    """
+    def __init__(self, detector, fuente, tamCola=2, dibujarEsqueleto=False, dibujarNotas=True, planificador=None):
+        self.detector = detector
+        self.planificador = planificador
+        self.fuente = fuente
+        self.dibujarEsqueleto = dibujarEsqueleto
+        self.dibujarNotas = dibujarNotas
+        self._colas = {nombre: colaDescartaAntiguos(tamCola)
+                       for nombre in ('captura', 'inferencia', 'marcadores', 'pintado')}
+        self._parar = threading.Event()
+        self._hilos = []
+        # Primera excepción de una etapa, que se relanza en obtenerResultado()
+        self._error = None
+
+    def iniciar(self):
+        """
+        Arranca los hilos de captura, inferencia, marcadores y pintado.
+        """
+        self._parar.clear()
+        self._error = None
+        etapas = [(self._capturar, ()),
+                  (self._etapa, ('captura', 'inferencia', self._inferir)),
+                  (self._etapa, ('inferencia', 'marcadores', self._marcadores)),
+                  (self._etapa, ('marcadores', 'pintado', self._pintar))]
+        self._hilos = [threading.Thread(target=funcion, args=args, daemon=True) for funcion, args in etapas]
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def detener(self, timeout=1):
+        """
+        Detiene la captura. El resto de etapas terminan en cuanto vacían su cola de entrada.
+
+        :param timeout: tiempo máximo de espera por cada hilo
+        """
+        self._parar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+
+    def obtenerResultado(self, timeout=None):
+        """
+        Devuelve el siguiente frame procesado.
+
+        :param timeout: tiempo máximo de espera en segundos (None = sin límite)
+        :return: resultadoFrame, o None si la fuente se ha agotado o el pipeline se ha detenido
+        :raises queue.Empty: si se agota el tiempo de espera
+        :raises Exception: la excepción de la etapa que haya fallado, una vez entregados los frames anteriores
+        """
+        resultado = self._colas['pintado'].get(timeout)
+        if resultado is None and self._error is not None:
+            raise self._error
+        return resultado
+
+    def descartados(self):
+        """
+        :return: diccionario con el número de elementos descartados en cada cola
+        """
+        return {nombre: cola.descartados for nombre, cola in self._colas.items()}
+
+    def _capturar(self):
+        salida = self._colas['captura']
+        id = 0
+        try:
+            while not self._parar.is_set():
+                success, img = self.fuente.read()
+                if not success:
+                    break
+                salida.put((id, time.time(), img))
+                id += 1
+        except Exception as error:
+            self._fallo(error)
+        finally:
+            salida.close()
+
+    def _etapa(self, entrada, salida, funcion):
+        entrada, salida = self._colas[entrada], self._colas[salida]
+        try:
+            while True:
+                elemento = entrada.get()
+                if elemento is None or self._parar.is_set():
+                    break
+                salida.put(funcion(*elemento))
+        except Exception as error:
+            self._fallo(error)
+        finally:
+            salida.close()
+
+    def _fallo(self, error):
+        # Una etapa ha fallado: se guarda el error para obtenerResultado() y se para la captura. Las etapas
+        # siguientes terminan al cerrarse sus colas, así que el hilo no muere sin que nadie se entere
+        if self._error is None:
+            self._error = error
+        self._parar.set()
+
+    def _inferir(self, id, timestamp, img):
+        return id, timestamp, img, (self.planificador or self.detector).inferirManos(img)
+
+    def _marcadores(self, id, timestamp, img, resultados):
+        lmLists = [self.detector.detectarPosicion(img, mano, resultados) for mano in (0, 1)]
+        notas = [self.detector.detectarNotas(lmList, mano) for mano, lmList in enumerate(lmLists)]
+        return id, timestamp, img, resultados, lmLists, notas
+
+    def _pintar(self, id, timestamp, img, resultados, lmLists, notas):
+        if self.dibujarEsqueleto:
+            self.detector.dibujarManos(img, resultados)
+        for mano, lmList in enumerate(lmLists):
+            self.detector.pintarNotas(img, lmList, mano, self.dibujarNotas)
+        return resultadoFrame(id, timestamp, img, lmLists, notas)
@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+
+# Mismos campos que los resultados de MediaPipe que usa detectorDeManos
+resultadosManos = namedtuple('resultadosManos', ['multi_hand_landmarks', 'multi_handedness'])
+
+
+class planificadorDeManos():
+    """
+    planificadorDeManos. Decide en cada frame si se ejecuta la inferencia completa de MediaPipe o si basta con seguir
+    los marcadores del frame anterior con flujo óptico (Lucas-Kanade piramidal sobre los 21 puntos de cada mano),
+    que es mucho más barato. La inferencia se ejecuta:
+
+    * cada `intervalo` frames. El intervalo se ajusta solo para alcanzar fpsObjetivo a partir del tiempo medio de una
+      inferencia y de un seguimiento: si la inferencia ya cabe en el tiempo de un frame, se infiere en todos
+    * cuando hay movimiento: los puntos seguidos se desplazan más de umbralMovimiento (fracción de la diagonal) o
+      se pierden, o bien, si no hay manos en la escena, la imagen cambia respecto al frame anterior
+
+    Los resultados tienen la misma forma que los de MediaPipe (multi_hand_landmarks, multi_handedness), así que se
+    pueden pasar a detectorDeManos.detectarPosicion(), dibujarManos(), etc.
+
+    ==================  =========================== ==================================================================
+    Atributos           Valor por defecto           Comentarios
+    ==================  =========================== ==================================================================
+    detector            (requerido)                 detectorDeManos que ejecuta la inferencia
+    fpsObjetivo         25                          Frames por segundo que se intenta alcanzar
+    intervaloMaximo     10                          Máximo número de frames entre dos inferencias
+    umbralMovimiento    0.02                        Desplazamiento medio de los marcadores (fracción de la diagonal)
+                                                    a partir del cual se vuelve a inferir
+    umbralEscena        8                           Diferencia media de gris (0-255) que cuenta como movimiento
+                                                    cuando no hay manos que seguir
+    ventana             60                          Frames que se usan para calcular las estadísticas
+    intervalo           1                           Intervalo actual entre inferencias (se ajusta automáticamente)
+    ==================  =========================== ==================================================================
+
+    =================  ========================  =====================================================================
+    Métodos            Parámetros                Comentario
+    =================  ========================  =====================================================================
+    inferirManos       img                       Devuelve los resultados del frame, inferidos o seguidos
+    detectarManos      img                       Como detectorDeManos.detectarManos(): guarda los resultados en el
+                       draw                      detector para usar después detectarPosicion() y detectarNotas()
+    estadisticas                                 FPS, inferencias por segundo, fracción de frames con inferencia
+                                                 e intervalo actual
+    =================  ========================  =====================================================================
+
+    Ejemplos:
+    ===========
+    >>> detector = ddm.detectorDeManos(confianzaDeteccion=0.8)
+    >>> planificador = planificadorDeManos(detector, fpsObjetivo=25)
+    >>> img_result = planificador.detectarManos(img, draw=True)
+    >>> lmList1 = detector.detectarPosicion(img, 0)
+    >>> planificador.estadisticas()['inferencias_por_segundo']
+    """
+    def __init__(self, detector, fpsObjetivo=25, intervaloMaximo=10, umbralMovimiento=0.02, umbralEscena=8,
+                 ventana=60):
+        self.detector = detector
+        self.fpsObjetivo = fpsObjetivo
+        self.intervaloMaximo = intervaloMaximo
+        self.umbralMovimiento = umbralMovimiento
+        self.umbralEscena = umbralEscena
+        self.intervalo = 1
+        # Estado del seguimiento: último frame en gris (y reducido, para comparar escenas sin manos), marcadores de
+        # la última inferencia o del último seguimiento y sus puntos en píxeles para el flujo óptico
+        self._gris = None
+        self._reducido = None
+        self._resultados = None
+        self._puntos = None
+        self._desdeInferencia = 0
+        # Tiempo medio (media móvil exponencial) de un frame con inferencia y de un frame con seguimiento
+        self._tiempoInferencia = None
+        self._tiempoSeguimiento = None
+        self._historial = deque(maxlen=ventana)
+        # estadisticas() se puede llamar desde otro hilo (p.ej. la interfaz) mientras el de inferencia añade frames
+        self._candado = threading.Lock()
+
+    def inferirManos(self, img):
+        """
+        Devuelve los resultados de las manos del frame, ejecutando MediaPipe o siguiendo los marcadores anteriores
+        según corresponda.
+
+        :param img: Frame de la escena (BGR)
+        :return: resultados con multi_hand_landmarks y multi_handedness
+        """
+        inicio = time.perf_counter()
+        gris = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        reducido = cv2.resize(gris, (80, 60), interpolation=cv2.INTER_AREA)
+
+        resultados = None
+        if self._gris is not None and self._desdeInferencia < self.intervalo:
+            if self._puntos is not None:
+                resultados = self.__seguir(gris)
+            elif cv2.absdiff(reducido, self._reducido).mean() < self.umbralEscena:
+                # Sin manos y sin cambios en la escena: los resultados siguen siendo válidos
+                resultados = self._resultados
+
+        inferido = resultados is None
+        if inferido:
+            resultados = self.__inferir(img)
+        else:
+            self._desdeInferencia += 1
+        self._resultados = resultados
+        self._gris = gris
+        self._reducido = reducido
+
+        duracion = time.perf_counter() - inicio
+        self.__actualizar(inferido, duracion)
+        return resultados
+
+    def detectarManos(self, img, draw=False):
+        """
+        Equivalente a detectorDeManos.detectarManos() usando el planificador: guarda los resultados en el detector.
+
+        :param img: Frame de la escena donde detectaremos la mano
+        :param draw: Si es True dibuja el modelo de mano sobre la escena
+        """
+        self.detector.results = self.inferirManos(img)
+        if draw:
+            self.detector.dibujarManos(img, self.detector.results)
+        return img
+
+    def estadisticas(self):
+        """
+        :return: diccionario con fps (frames por segundo procesados), inferencias_por_segundo, fraccion_inferencia
+                 (frames con inferencia completa / frames totales) e intervalo actual, sobre los últimos frames
+        """
+        with self._candado:
+            historial = list(self._historial)
+            intervalo = self.intervalo
+        frames = len(historial)
+        inferencias = sum(inferido for _, inferido in historial)
+        segundos = historial[-1][0] - historial[0][0] if frames > 1 else 0
+        return {'fps': (frames - 1) / segundos if segundos else None,
+                'inferencias_por_segundo': (inferencias - historial[0][1]) / segundos if segundos else None,
+                'fraccion_inferencia': inferencias / frames if frames else None,
+                'intervalo': intervalo}
+
+    def __inferir(self, img):
+        resultados = self.detector.inferirManos(img)
+        self._desdeInferencia = 1
+        if resultados.multi_hand_landmarks:
+            heigth, width = img.shape[:2]
+            normalizados = np.array([[(landmark.x, landmark.y) for landmark in mano.landmark]
+                                     for mano in resultados.multi_hand_landmarks], dtype=np.float32)
+            self._puntos = (normalizados * (width, heigth)).reshape(-1, 1, 2).astype(np.float32)
+        else:
+            self._puntos = None
+        return resultados
+
+    def __seguir(self, gris):
+        # Flujo óptico de los marcadores desde el frame anterior. Si se pierde algún punto o la mano se mueve
+        # demasiado, devuelve None para que se vuelva a inferir
+        puntos, estado, _ = cv2.calcOpticalFlowPyrLK(self._gris, gris, self._puntos, None,
+                                                     winSize=(21, 21), maxLevel=2)
+        if puntos is None or not estado.all():
+            return None
+        heigth, width = gris.shape[:2]
+        desplazamiento = np.linalg.norm(puntos - self._puntos, axis=2).mean()
+        if desplazamiento > self.umbralMovimiento * math.hypot(width, heigth):
+            return None
+        self._puntos = puntos
+
+        # Copias de los marcadores anteriores con las nuevas x e y (la z se mantiene): así los resultados de los
+        # frames ya entregados no cambian
+        normalizados = (puntos.reshape(-1, 21, 2) / (width, heigth)).tolist()
+        manos = []
+        for mano, coordenadas in zip(self._resultados.multi_hand_landmarks, normalizados):
+            copia = type(mano)()
+            copia.CopyFrom(mano)
+            for landmark, (x, y) in zip(copia.landmark, coordenadas):
+                landmark.x, landmark.y = x, y
+            manos.append(copia)
+        return resultadosManos(manos, self._resultados.multi_handedness)
+
+    def __actualizar(self, inferido, duracion):
+        with self._candado:
+            self._historial.append((time.perf_counter(), inferido))
+        if inferido:
+            self._tiempoInferencia = duracion if self._tiempoInferencia is None \
+                else 0.9 * self._tiempoInferencia + 0.1 * duracion
+        else:
+            self._tiempoSeguimiento = duracion if self._tiempoSeguimiento is None \
+                else 0.9 * self._tiempoSeguimiento + 0.1 * duracion
+
+        # Con un intervalo N el tiempo medio por frame es (inferencia + (N - 1) * seguimiento) / N: buscamos el
+        # menor N que lo deja por debajo del tiempo de un frame a fpsObjetivo
+        objetivo = 1 / self.fpsObjetivo
+        if self._tiempoInferencia <= objetivo:
+            intervalo = 1
+        elif self._tiempoSeguimiento is None:
+            # Todavía no sabemos lo que cuesta seguir: probamos a saltar un frame
+            intervalo = 2
+        elif self._tiempoSeguimiento >= objetivo:
+            intervalo = self.intervaloMaximo
+        else:
+            intervalo = math.ceil((self._tiempoInferencia - self._tiempoSeguimiento) /
+                                  (objetivo - self._tiempoSeguimiento))
+        self.intervalo = max(1, min(intervalo, self.intervaloMaximo))
@@ -0,0 +1,234 @@
+import argparse
+import multiprocessing
+import queue
+import sys
+import threading
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from . import detectorDeManos as ddm
+
+
+def _saltar(cap, inicio):
+    # Coloca el vídeo en el frame inicio y devuelve el número del frame que se leerá a continuación. Con algunos
+    # códecs CAP_PROP_POS_FRAMES no salta exactamente a ese frame: se lee la posición real y, si el salto se ha
+    # pasado, se vuelve a saltar más atrás; desde ahí se avanza decodificando hasta inicio
+    objetivo = inicio
+    while True:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, objetivo)
+        posicion = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if posicion <= inicio or objetivo == 0:
+            break
+        objetivo = max(0, objetivo - 2 * (posicion - inicio))
+    while posicion < inicio and cap.grab():
+        posicion += 1
+    return posicion
+
+
+def _decodificar(ruta, inicio, fin, cola, parar):
+    # Hilo de decodificación: lee los frames [inicio, fin) del vídeo (hasta el final si fin es None) y los deja en la
+    # cola con su número de frame. Al terminar deja un None
+    cap = cv2.VideoCapture(ruta)
+    try:
+        frame = _saltar(cap, inicio) if inicio else 0
+        while (fin is None or frame < fin) and not parar.is_set():
+            success, img = cap.read()
+            if not success:
+                break
+            # Sin descartar frames: si la inferencia va más lenta, la decodificación espera
+            _poner(cola, (frame, img), parar)
+            frame += 1
+    finally:
+        cap.release()
+        _poner(cola, None, parar)
+
+
+def _poner(cola, elemento, parar):
+    # put() que deja de esperar si se pide parar (p.ej. porque la inferencia ha fallado y nadie vacía la cola)
+    while not parar.is_set():
+        try:
+            cola.put(elemento, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _procesarSegmento(ruta, inicio, fin, tamCola, opciones):
+    # Procesa un segmento del vídeo con su propio detector. Se ejecuta en este proceso o en uno del pool
+    detector = ddm.detectorDeManos(**opciones)
+    cola = queue.Queue(tamCola)
+    parar = threading.Event()
+    hilo = threading.Thread(target=_decodificar, args=(ruta, inicio, fin, cola, parar), daemon=True)
+    hilo.start()
+    frames, landmarks, notas = [], [], []
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is None:
+                break
+            frame, img = elemento
+            resultados = detector.inferirManos(img)
+            coordenadas = np.full((2, 21, 3), np.nan, dtype=np.float32)
+            for mano in (0, 1):
+                posiciones = detector.detectarPosicionArray(img, mano, resultados, profundidad=True)
+                if posiciones is not None:
+                    coordenadas[mano] = posiciones
+            frames.append(frame)
+            landmarks.append(coordenadas)
+            # Dedos que tocan su nota, con los píxeles enteros igual que detectarPosicion() + detectarNotas() en
+            # directo. detectarTocadasManos() reutiliza su array: se guarda una copia
+            notas.append(detector.detectarTocadasManos(img, resultados).copy())
+    finally:
+        parar.set()
+        hilo.join()
+    return {'frame': np.array(frames, dtype=np.int64),
+            'landmarks': np.array(landmarks, dtype=np.float32).reshape(-1, 2, 21, 3),
+            'notas': np.array(notas, dtype=bool).reshape(-1, 2, 4)}
+
+
+class procesadorDeVideo():
+    """
+    procesadorDeVideo. Analiza vídeos grabados sin interfaz gráfica: decodifica el vídeo en un hilo en segundo plano,
+    ejecuta la inferencia de detectorDeManos sin dibujar nada y guarda por frame los marcadores y las notas
+    detectadas en formato columnar (.npz de NumPy o .parquet). Los vídeos largos se pueden dividir en segmentos que
+    se procesan en paralelo en varios procesos.
+
+    El resultado es un diccionario de arrays con un elemento por frame:
+
+    ==================  =========================== ==================================================================
+    Clave               Forma                       Contenido
+    ==================  =========================== ==================================================================
+    frame               (n,) int64                  Número de frame en el vídeo
+    timestamp           (n,) float64                Segundos desde el inicio del vídeo (frame / fps)
+    manos               (n,) uint8                  Número de manos detectadas
+    landmarks           (n, 2, 21, 3) float32       x, y en píxeles y z en la escala de x de los 21 marcadores de cada
+                                                    mano (NaN si la mano no está), como detectarPosicionArray()
+    notas               (n, 2, 4) bool              Notas tocadas por cada mano, en el orden de TABLA_NOTAS
+    tablaNotas          (2, 4) str                  TABLA_NOTAS, para traducir notas a nombres
+    fps, ancho, alto    escalares                   Propiedades del vídeo
+    ==================  =========================== ==================================================================
+
+    Cada segmento empieza con un detector nuevo, así que en el primer frame de cada segmento MediaPipe detecta las
+    manos desde cero en lugar de seguirlas. Con algunos códecs el salto al inicio de un segmento no es exacto: se
+    comprueba la posición a la que ha saltado OpenCV y se corrige decodificando, de modo que los segmentos no se
+    solapan ni dejan huecos y el número de frame es el real.
+
+    También se puede usar desde la línea de comandos, sin pantalla:
+    ``python -m magic_hands.utils.procesadorDeVideo sesion.mp4 sesion.npz --segmentos 4``
+
+    ==================  =========================== ==================================================================
+    Atributos           Valor por defecto           Comentarios
+    ==================  =========================== ==================================================================
+    segmentos           1                           Número de segmentos en que se divide el vídeo
+    procesos            None                        Procesos para los segmentos. Por defecto, uno por segmento
+    tamCola             8                           Frames decodificados que pueden esperar a la inferencia
+    **opcionesDetector                              Parámetros de detectorDeManos (confianzaDeteccion, modoROI, ...)
+    ==================  =========================== ==================================================================
+
+    =================  ========================  =====================================================================
+    Métodos            Parámetros                Comentario
+    =================  ========================  =====================================================================
+    procesar           ruta                      Procesa el vídeo y devuelve el diccionario de arrays. Si se indica
+                       salida                    salida, lo guarda también con guardar()
+    guardar            datos                     Guarda los resultados en .npz o .parquet (según la extensión)
+                       salida
+    =================  ========================  =====================================================================
+
+    Ejemplos:
+    ===========
+    >>> procesador = procesadorDeVideo(segmentos=4, confianzaDeteccion=0.8)
+    >>> datos = procesador.procesar('sesion.mp4', 'sesion.npz')
+    >>> datos['notas'][:, 0].sum(axis=0)       # Frames en los que la primera mano toca cada nota
+    """
+    def __init__(self, segmentos=1, procesos=None, tamCola=8, **opcionesDetector):
+        self.segmentos = segmentos
+        self.procesos = procesos
+        self.tamCola = tamCola
+        self.opcionesDetector = opcionesDetector
+
+    def procesar(self, ruta, salida=None):
+        """
+        Procesa todos los frames del vídeo.
+
+        :param ruta: fichero de vídeo
+        :param salida: fichero .npz o .parquet donde guardar los resultados (opcional)
+        :return: diccionario de arrays con los resultados de cada frame
+        :raises IOError: si no se puede abrir el vídeo
+        """
+        cap = cv2.VideoCapture(ruta)
+        if not cap.isOpened():
+            raise IOError(f"No se puede abrir el vídeo {ruta}")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        ancho, alto = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+
+        if self.segmentos > 1 and total > self.segmentos:
+            # El último segmento llega hasta el final del vídeo: el número de frames que da OpenCV puede ser aproximado
+            limites = np.linspace(0, total, self.segmentos + 1).astype(int).tolist()
+            tramos = list(zip(limites[:-1], limites[1:-1] + [None]))
+            contexto = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.procesos or self.segmentos, mp_context=contexto) as pool:
+                futuros = [pool.submit(_procesarSegmento, ruta, inicio, fin, self.tamCola, self.opcionesDetector)
+                           for inicio, fin in tramos]
+                partes = [futuro.result() for futuro in futuros]
+        else:
+            partes = [_procesarSegmento(ruta, 0, None, self.tamCola, self.opcionesDetector)]
+
+        datos = {clave: np.concatenate([parte[clave] for parte in partes]) for clave in ('frame', 'landmarks', 'notas')}
+        datos['timestamp'] = datos['frame'] / fps if fps else np.full(len(datos['frame']), np.nan)
+        datos['manos'] = (~np.isnan(datos['landmarks'][:, :, 0, 0])).sum(axis=1).astype(np.uint8)
+        datos['tablaNotas'] = ddm.TABLA_NOTAS.astype(str)
+        datos['fps'], datos['ancho'], datos['alto'] = fps, ancho, alto
+        if salida is not None:
+            self.guardar(datos, salida)
+        return datos
+
+    def guardar(self, datos, salida):
+        """
+        Guarda los resultados de procesar(). En .npz cada clave es un array; en .parquet hay una fila por frame con
+        las columnas frame, timestamp, manos, una columna booleana por nota (mano0_Do, ...) y una por coordenada de
+        cada marcador (mano0_x0, mano0_y0, mano0_z0, ...). Parquet necesita pandas y pyarrow.
+
+        :param datos: diccionario devuelto por procesar()
+        :param salida: fichero .npz o .parquet
+        :raises ValueError: si la extensión no es .npz ni .parquet
+        """
+        if salida.endswith('.npz'):
+            np.savez_compressed(salida, **datos)
+        elif salida.endswith('.parquet'):
+            import pandas as pd
+            columnas = {'frame': datos['frame'], 'timestamp': datos['timestamp'], 'manos': datos['manos']}
+            for mano in (0, 1):
+                for dedo, nota in enumerate(datos['tablaNotas'][mano]):
+                    if nota:
+                        columnas[f"mano{mano}_{nota}"] = datos['notas'][:, mano, dedo]
+            for mano in (0, 1):
+                for id in range(21):
+                    for eje, coordenada in enumerate('xyz'):
+                        columnas[f"mano{mano}_{coordenada}{id}"] = datos['landmarks'][:, mano, id, eje]
+            tabla = pd.DataFrame(columnas)
+            tabla.attrs.update(fps=datos['fps'], ancho=datos['ancho'], alto=datos['alto'])
+            tabla.to_parquet(salida, index=False)
+        else:
+            raise ValueError(f"Formato de salida no soportado: {salida} (use .npz o .parquet)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detecta manos y notas en un vídeo grabado, sin interfaz gráfica.")
+    parser.add_argument('video', help="Fichero de vídeo.")
+    parser.add_argument('salida', help="Fichero de resultados (.npz o .parquet).")
+    parser.add_argument('--segmentos', type=int, default=1, help="Segmentos que se procesan en paralelo.")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos (por defecto, uno por segmento).")
+    parser.add_argument('--confianza', type=float, default=0.8, help="Confianza mínima de detección.")
+    args = parser.parse_args(argv)
+
+    datos = procesadorDeVideo(args.segmentos, args.procesos, confianzaDeteccion=args.confianza).procesar(args.video,
+                                                                                                        args.salida)
+    print(f"{len(datos['frame'])} frames, {int((datos['manos'] > 0).sum())} con manos -> {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
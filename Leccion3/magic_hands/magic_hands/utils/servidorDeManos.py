@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from . import detectorDeManos as ddm
+
+
+# Resultado de un frame de una de las fuentes (cámaras) del servidor
+resultadoStream = namedtuple('resultadoStream', ['fuente', 'id', 'timestamp', 'tiempoInferencia', 'lmLists', 'notas'])
+
+
+def _trabajador(entrada, salida, listo, opciones):
+    # Bucle de cada proceso del servidor. Cada fuente tiene su propio detectorDeManos (y por tanto su propio
+    # mpHands.Hands y su seguimiento entre frames), que se crea con el primer frame de la fuente y se reutiliza
+    detectores = {}
+    listo.set()
+    try:
+        while True:
+            elemento = entrada.get()
+            if elemento is None:
+                break
+            fuente, id, timestamp, img = elemento
+            detector = detectores.get(fuente)
+            if detector is None:
+                detector = detectores[fuente] = ddm.detectorDeManos(**opciones)
+            inicio = time.perf_counter()
+            resultados = detector.inferirManos(img)
+            lmLists = [detector.detectarPosicion(img, mano, resultados) for mano in (0, 1)]
+            notas = [detector.detectarNotas(lmList, mano) for mano, lmList in enumerate(lmLists)]
+            salida.put(resultadoStream(fuente, id, timestamp, time.perf_counter() - inicio, lmLists, notas))
+    finally:
+        # Avisa de que este proceso ha terminado
+        salida.put(None)
+
+
+class servidorDeManos():
+    """
+    servidorDeManos. Detecta las manos de varias cámaras (fuentes) a la vez repartiéndolas entre varios procesos, de
+    modo que una sola máquina puede atender N cámaras usando todos sus núcleos (MediaPipe y el GIL limitan lo que se
+    gana con hilos dentro de un mismo proceso).
+
+    Cada fuente se asigna a un proceso la primera vez que envía un frame (por turnos, para repartir la carga) y se
+    queda siempre en él: allí tiene su propio detectorDeManos, que se reutiliza frame a frame y conserva el
+    seguimiento de las manos de esa cámara. Los frames se envían a cada proceso por una cola acotada; si un proceso
+    se queda atrás, se descarta el frame más antiguo de su cola en lugar de bloquear la captura.
+
+    Los frames pueden llegar de las fuentes indicadas al crear el servidor (un hilo de captura por fuente) o
+    enviarse directamente con procesar(). Los resultados se recogen con obtenerResultado(), en el orden en que
+    terminan, identificados por fuente, id de frame y timestamp de captura.
+
+    Como los procesos se crean con el método 'spawn', el programa que use el servidor debe estar protegido con
+    ``if __name__ == '__main__':``.
+
+    ==================  =========================== ==================================================================
+    Atributos           Valor por defecto           Comentarios
+    ==================  =========================== ==================================================================
+    fuentes             None                        Diccionario {id de la fuente: objeto con read() -> (success, img)}
+                                                    (p.ej. cv2.VideoCapture) o lista de fuentes (ids 0, 1, ...)
+    procesos            None                        Número de procesos. Por defecto, uno por fuente sin pasar del
+                                                    número de CPUs
+    tamCola             2                           Tamaño máximo de la cola de frames de cada proceso
+    **opcionesDetector                              Parámetros de detectorDeManos (confianzaDeteccion, modoROI, ...)
+    ==================  =========================== ==================================================================
+
+    =================  ========================  =====================================================================
+    Métodos            Parámetros                Comentario
+    =================  ========================  =====================================================================
+    iniciar            timeout                   Arranca los procesos y los hilos de captura de las fuentes
+    procesar           fuente                    Envía un frame de la fuente indicada. Devuelve False si se ha
+                       img                       descartado algún frame por ir el proceso lento
+                       timestamp
+    obtenerResultado   timeout                   Devuelve el siguiente resultadoStream (fuente, id, timestamp,
+                                                 tiempoInferencia, lmLists, notas) o None si el servidor ha terminado
+    detener            timeout                   Para la captura y los procesos
+    estadisticas                                 Frames enviados y descartados de cada fuente
+    =================  ========================  =====================================================================
+
+    Ejemplos:
+    ===========
+    >>> servidor = servidorDeManos({'izquierda': cv2.VideoCapture(0), 'derecha': cv2.VideoCapture(1)},
+    ...                            confianzaDeteccion=0.8).iniciar()
+    >>> resultado = servidor.obtenerResultado(timeout=1)
+    >>> resultado.fuente, resultado.id, resultado.notas
+    ('derecha', 0, [['Do'], []])
+    >>> servidor.detener()
+    """
+    def __init__(self, fuentes=None, procesos=None, tamCola=2, **opcionesDetector):
+        if isinstance(fuentes, (list, tuple)):
+            fuentes = dict(enumerate(fuentes))
+        self.fuentes = fuentes or {}
+        self.procesos = procesos or max(1, min(len(self.fuentes) or os.cpu_count(), os.cpu_count()))
+        self.tamCola = tamCola
+        self.opcionesDetector = opcionesDetector
+        self._entradas = []
+        self._salida = None
+        self._trabajadores = []
+        self._hilos = []
+        self._parar = threading.Event()
+        self._candado = threading.Lock()
+        # Proceso asignado, siguiente id de frame, frames enviados y descartados de cada fuente
+        self._asignacion = {}
+        self._ids = {}
+        self._descartados = {}
+        self._terminados = 0
+        self._capturando = 0
+
+    def iniciar(self, timeout=30):
+        """
+        Arranca los procesos y, cuando están listos, un hilo de captura por cada fuente.
+
+        :param timeout: tiempo máximo de espera por el arranque de cada proceso
+        """
+        contexto = multiprocessing.get_context('spawn')
+        self._parar.clear()
+        self._terminados = 0
+        self._entradas = [contexto.Queue(self.tamCola) for _ in range(self.procesos)]
+        self._salida = contexto.Queue()
+        listos = [contexto.Event() for _ in self._entradas]
+        self._trabajadores = [contexto.Process(target=_trabajador,
+                                               args=(entrada, self._salida, listo, self.opcionesDetector), daemon=True)
+                              for entrada, listo in zip(self._entradas, listos)]
+        for trabajador in self._trabajadores:
+            trabajador.start()
+        # La captura empieza cuando los procesos han arrancado (importar MediaPipe lleva su tiempo): si no, las
+        # colas se llenarían y se descartarían los primeros frames
+        for listo in listos:
+            listo.wait(timeout)
+        self._capturando = len(self.fuentes)
+        self._hilos = [threading.Thread(target=self._capturar, args=(fuente, origen), daemon=True)
+                       for fuente, origen in self.fuentes.items()]
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def procesar(self, fuente, img, timestamp=None):
+        """
+        Envía un frame al proceso de la fuente. Si su cola está llena se descarta el frame más antiguo.
+
+        :param fuente: id de la fuente (cámara) del frame
+        :param img: frame (BGR)
+        :param timestamp: instante de captura. Por defecto, time.time()
+        :return: False si se ha descartado algún frame, True si no
+        :raises RuntimeError: si el servidor no se ha iniciado con iniciar()
+        """
+        if not self._entradas:
+            raise RuntimeError("servidorDeManos is not running. Call iniciar() before procesar().")
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._candado:
+            if fuente not in self._asignacion:
+                self._asignacion[fuente] = len(self._asignacion) % self.procesos
+                self._ids[fuente] = 0
+                self._descartados[fuente] = 0
+            entrada = self._entradas[self._asignacion[fuente]]
+            id = self._ids[fuente]
+            self._ids[fuente] += 1
+        elemento = (fuente, id, timestamp, img)
+        try:
+            entrada.put_nowait(elemento)
+            return True
+        except queue.Full:
+            pass
+        # Cola llena: quitamos el frame más antiguo (que puede ser de otra fuente del mismo proceso) y lo volvemos a
+        # intentar. Si el proceso ya lo ha recogido, se descarta el nuevo
+        try:
+            descartado = entrada.get_nowait()
+            entrada.put_nowait(elemento)
+        except queue.Empty:
+            descartado = None
+        except queue.Full:
+            descartado = elemento
+        if descartado is not None:
+            with self._candado:
+                self._descartados[descartado[0]] += 1
+        return False
+
+    def obtenerResultado(self, timeout=None):
+        """
+        Devuelve el siguiente frame procesado de cualquiera de las fuentes.
+
+        :param timeout: tiempo máximo de espera en segundos (None = sin límite)
+        :return: resultadoStream, o None si todos los procesos han terminado
+        :raises queue.Empty: si se agota el tiempo de espera
+        """
+        while self._terminados < len(self._trabajadores):
+            resultado = self._salida.get(timeout=timeout)
+            if resultado is not None:
+                return resultado
+            self._terminados += 1
+        return None
+
+    def detener(self, timeout=1):
+        """
+        Detiene la captura de las fuentes y los procesos. Los frames que queden en las colas se descartan.
+
+        :param timeout: tiempo máximo de espera por cada hilo y proceso
+        """
+        self._parar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self.__cerrarEntradas()
+        for trabajador in self._trabajadores:
+            trabajador.join(timeout)
+            if trabajador.is_alive():
+                # Un proceso terminado a la fuerza no avisa por la salida: se avisa por él para que
+                # obtenerResultado() no se quede esperando
+                trabajador.terminate()
+                trabajador.join(timeout)
+                self._salida.put(None)
+
+    def estadisticas(self):
+        """
+        :return: diccionario {fuente: {'frames': frames enviados, 'descartados': frames descartados}}
+        """
+        with self._candado:
+            return {fuente: {'frames': self._ids[fuente], 'descartados': self._descartados[fuente]}
+                    for fuente in self._asignacion}
+
+    def _capturar(self, fuente, origen):
+        try:
+            while not self._parar.is_set():
+                success, img = origen.read()
+                if not success:
+                    break
+                self.procesar(fuente, img)
+        finally:
+            # Cuando se agota la última fuente, los procesos terminan al vaciar sus colas
+            with self._candado:
+                self._capturando -= 1
+                ultima = self._capturando == 0
+            if ultima and not self._parar.is_set():
+                self.__cerrarEntradas()
+
+    def __cerrarEntradas(self):
+        # Un None por proceso para que termine su bucle. Si su cola sigue llena (el proceso va lento) se descarta el
+        # frame más antiguo hasta que quepa: sin el None el proceso no terminaría nunca
+        for entrada in self._entradas:
+            while True:
+                try:
+                    entrada.put(None, timeout=1)
+                    break
+                except queue.Full:
+                    pass
+                try:
+                    descartado = entrada.get_nowait()
+                except queue.Empty:
+                    continue
+                if descartado is not None:
+                    with self._candado:
+                        self._descartados[descartado[0]] += 1
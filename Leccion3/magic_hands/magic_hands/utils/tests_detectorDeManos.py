@@ -0,0 +1,400 @@
+import pytest
+import queue
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+
+cv2 = pytest.importorskip('cv2')
+from magic_hands.utils import pipelineDeManos as pdm
+from magic_hands.utils import planificadorDeManos as plm
+try:
+    # El detector (y los módulos que lo usan) necesitan MediaPipe con la API mp.solutions; el pipeline no
+    from magic_hands.utils import detectorDeManos as ddm
+    from magic_hands.utils import procesadorDeVideo as pdv
+    ddm.mp.solutions.hands
+except (ImportError, AttributeError):
+    ddm = pdv = None
+conMediapipe = pytest.mark.skipif(ddm is None, reason='requiere mediapipe con mp.solutions')
+
+
+def resultados(*manos):
+    # Resultados como los de MediaPipe a partir de arrays (21, 3) de coordenadas normalizadas
+    return SimpleNamespace(multi_hand_landmarks=[
+        SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in mano]) for mano in manos])
+
+
+def mano(tocando=()):
+    # Mano con las puntas separadas del pulgar, salvo las de los marcadores de tocando, que están sobre él
+    coordenadas = np.tile(np.linspace(0.1, 0.9, 21)[:, None], (1, 3))
+    coordenadas[:, 2] = 0.0
+    for id in tocando:
+        coordenadas[id] = coordenadas[ddm.PULGAR]
+    return coordenadas
+
+
+@conMediapipe
+def test_detectarNotas_mano_fuera_de_rango():
+    detector = ddm.detectorDeManos()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    lmList = detector.detectarPosicion(img, 0, resultados(mano(tocando=(8,))))
+
+    assert detector.detectarNotas(lmList, 0) == ['Do']
+    assert detector.detectarNotas(lmList, 2) == []
+    assert detector.detectarNotas(lmList, -1) == []
+
+
+@conMediapipe
+def test_detectarPosicionArray_escribe_en_el_buffer():
+    detector = ddm.detectorDeManos()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    primera = mano()
+    posiciones = detector.detectarPosicionArray(img, 0, resultados(primera))
+
+    assert posiciones.tolist() == [[int(x * 640), int(y * 480)] for x, y, _ in primera]
+    # El frame siguiente se escribe en la misma memoria
+    siguiente = detector.detectarPosicionArray(img, 0, resultados(mano(tocando=(8,))))
+    assert np.shares_memory(siguiente, posiciones)
+    assert posiciones[8].tolist() == posiciones[ddm.PULGAR].tolist()
+    assert detector.detectarPosicionArray(img, 1, resultados(primera)) is None
+
+
+@conMediapipe
+def test_detectarNotasManos_coincide_con_detectarNotas():
+    detector = ddm.detectorDeManos()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    dos = resultados(mano(tocando=(8, 16)), mano(tocando=(12, 20)))
+    esperadas = [detector.detectarNotas(detector.detectarPosicion(img, m, dos), m) for m in (0, 1)]
+
+    assert esperadas == [['Do', 'Mi'], ['La']]
+    assert detector.detectarNotasManos(img, dos) == esperadas
+    # Con una sola mano, el buffer de la segunda (del frame anterior) no da notas
+    assert detector.detectarNotasManos(img, resultados(mano())) == [[], []]
+    assert detector.detectarNotasManos(img, resultados()) == [[], []]
+
+
+@conMediapipe
+def test_detectarTocadasManos_por_punta_de_dedo():
+    detector = ddm.detectorDeManos()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    # El meñique de la segunda mano no tiene nota: aunque toque el pulgar no cuenta
+    tocadas = detector.detectarTocadasManos(img, resultados(mano(tocando=(12,)), mano(tocando=(8, 20))))
+
+    assert tocadas.tolist() == [[False, True, False, False], [True, False, False, False]]
+
+
+@conMediapipe
+def test_pintarNotas_con_lista_o_array():
+    detector = ddm.detectorDeManos()
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    dos = resultados(mano(), mano())
+    for m in (0, 1):
+        conLista, conArray = img.copy(), img.copy()
+        detector.pintarNotas(conLista, detector.detectarPosicion(img, m, dos), m, True)
+        detector.pintarNotas(conArray, detector.detectarPosicionArray(img, m, dos), m, True)
+        assert conLista.any() and np.array_equal(conLista, conArray)
+    # Sin la mano no se pinta nada
+    detector.pintarNotas(img, detector.detectarPosicionArray(img, 1, resultados(mano())), 1, True)
+    detector.pintarNotas(img, [], 0, True)
+    assert not img.any()
+
+
+class HandsFalso():
+    # Sustituye a mpHands.Hands: guarda sus parámetros y la forma de cada imagen procesada, y devuelve una mano con
+    # dos marcadores en (x, y, z) normalizados respecto a esa imagen
+    def __init__(self, **parametros):
+        self.parametros = parametros
+        self.formas = []
+
+    def process(self, rgb):
+        self.formas.append(rgb.shape)
+        return resultados([(0.5, 0.25, 0.1), (0.6, 0.35, 0.0)])
+
+
+@conMediapipe
+def test_modoROI_usa_modo_imagen_estatica(monkeypatch):
+    monkeypatch.setattr(ddm.mp.solutions.hands, 'Hands', HandsFalso)
+
+    assert ddm.detectorDeManos().hands.parametros['static_image_mode'] is False
+    assert ddm.detectorDeManos(anchoMaximo=320).hands.parametros['static_image_mode'] is False
+    assert ddm.detectorDeManos(modoROI=True).hands.parametros['static_image_mode'] is True
+
+
+@conMediapipe
+@pytest.mark.parametrize('anchoMaximo, forma', [(None, (200, 200, 3)), (100, (100, 100, 3))])
+def test_modoROI_lleva_los_marcadores_al_frame_completo(monkeypatch, anchoMaximo, forma):
+    monkeypatch.setattr(ddm.mp.solutions.hands, 'Hands', HandsFalso)
+    detector = ddm.detectorDeManos(modoROI=True, margenROI=0.0, anchoMaximo=anchoMaximo)
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    # Sin región se procesa el frame completo (reducido a anchoMaximo) y la región se centra en la mano
+    detector.inferirManos(img)
+    assert detector.hands.formas[0] == ((480, 640, 3) if anchoMaximo is None else (75, 100, 3))
+    assert detector._roi is not None
+
+    detector._roi = (100, 50, 300, 250)
+    resultados = detector.inferirManos(img)
+    landmark = resultados.multi_hand_landmarks[0].landmark[0]
+    # El recorte de 200x200 (reducido o no) se ha pasado a MediaPipe, y sus coordenadas vuelven al frame: x e y
+    # según la posición del recorte y z (en la escala del ancho procesado) según su ancho
+    assert detector.hands.formas[1] == forma
+    assert landmark.x == pytest.approx((100 + 0.5 * 200) / 640)
+    assert landmark.y == pytest.approx((50 + 0.25 * 200) / 480)
+    assert landmark.z == pytest.approx(0.1 * 200 / 640)
+    # La mano sigue dentro de la región: no cambia
+    assert detector._roi == (100, 50, 300, 250)
+
+
+class CapturaInexacta():
+    # Vídeo de 100 frames en el que saltar con CAP_PROP_POS_FRAMES a un frame que no es el 0 se pasa 5 frames
+    def __init__(self):
+        self.posicion = 0
+
+    def set(self, propiedad, valor):
+        self.posicion = min(100, int(valor) + 5) if valor else 0
+
+    def get(self, propiedad):
+        return float(self.posicion)
+
+    def grab(self):
+        self.posicion += 1
+        return self.posicion <= 100
+
+
+@conMediapipe
+def test_saltar_corrige_saltos_inexactos():
+    cap = CapturaInexacta()
+
+    assert pdv._saltar(cap, 40) == 40
+    assert cap.posicion == 40
+    # Al principio del vídeo no se puede saltar más atrás que el frame 0
+    assert pdv._saltar(CapturaInexacta(), 3) == 3
+
+
+@conMediapipe
+def test_procesar_segmentos_sin_huecos_ni_solapes(tmp_path):
+    cv2 = cv2 = pytest.importorskip('cv2')
+    ruta = str(tmp_path / 'video.avi')
+    video = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for frame in range(30):
+        video.write(np.full((48, 64, 3), frame * 8, dtype=np.uint8))
+    video.release()
+
+    for segmentos in (1, 3):
+        datos = pdv.procesadorDeVideo(segmentos=segmentos).procesar(ruta, str(tmp_path / 'salida.npz'))
+        assert datos['frame'].tolist() == list(range(30))
+        assert datos['notas'].shape == (30, 2, 4) and not datos['notas'].any()
+
+
+@conMediapipe
+def test_servidor_cierra_colas_llenas():
+    from magic_hands.utils import servidorDeManos as sdm
+    import queue
+    servidor = sdm.servidorDeManos(procesos=1, tamCola=2)
+    # Cola llena de un proceso que no la vacía: el None de cierre tiene que caber igualmente
+    servidor._entradas = [queue.Queue(2)]
+    for id in range(2):
+        servidor.procesar('camara', None, timestamp=id)
+    servidor._servidorDeManos__cerrarEntradas()
+
+    entrada = servidor._entradas[0]
+    assert [entrada.get_nowait() for _ in range(entrada.qsize())][-1] is None
+    assert servidor.estadisticas() == {'camara': {'frames': 2, 'descartados': 1}}
+
+
+@conMediapipe
+def test_servidor_procesar_sin_iniciar():
+    from magic_hands.utils import servidorDeManos as sdm
+    servidor = sdm.servidorDeManos(procesos=1)
+
+    with pytest.raises(RuntimeError, match='iniciar'):
+        servidor.procesar('camara', np.zeros((4, 4, 3), dtype=np.uint8))
+    assert servidor.estadisticas() == {}
+
+
+def test_colaDescartaAntiguos_descarta_el_mas_antiguo():
+    cola = pdm.colaDescartaAntiguos(maxsize=2)
+    for elemento in range(3):
+        cola.put(elemento)
+
+    assert cola.descartados == 1
+    assert [cola.get(), cola.get()] == [1, 2]
+    with pytest.raises(queue.Empty):
+        cola.get(timeout=0.01)
+    # Cerrada, entrega lo que le quede y después None
+    cola.put(3)
+    cola.close()
+    assert [cola.get(), cola.get(), cola.get(timeout=0.01)] == [3, None, None]
+
+
+def test_colaDescartaAntiguos_close_despierta_a_get():
+    cola = pdm.colaDescartaAntiguos()
+    recibido = []
+    hilo = threading.Thread(target=lambda: recibido.append(cola.get()))
+    hilo.start()
+    time.sleep(0.05)
+    cola.close()
+    hilo.join(1)
+    assert not hilo.is_alive() and recibido == [None]
+
+
+class FuenteFalsa():
+    # Fuente con read() como cv2.VideoCapture que da n frames (o infinitos con n=None)
+    def __init__(self, n=None):
+        self.n = n
+        self.leidos = 0
+
+    def read(self):
+        if self.n is not None and self.leidos >= self.n:
+            return False, None
+        self.leidos += 1
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+class DetectorFalso():
+    # Lo que usa el pipeline de detectorDeManos, sin MediaPipe. Con error, inferirManos() lo lanza en el frame fallo
+    def __init__(self, error=None, fallo=0):
+        self.error = error
+        self.fallo = fallo
+        self.inferidos = 0
+
+    def inferirManos(self, img):
+        if self.error is not None and self.inferidos == self.fallo:
+            raise self.error
+        self.inferidos += 1
+        return SimpleNamespace(multi_hand_landmarks=None)
+
+    def detectarPosicion(self, img, mano=0, resultados=None):
+        return []
+
+    def detectarNotas(self, lmList, mano=0):
+        return []
+
+    def dibujarManos(self, img, resultados):
+        return img
+
+    def pintarNotas(self, img, lmList, mano=0, draw=False):
+        pass
+
+
+def resultadosPipeline(pipeline):
+    # Ids de los frames que salen del pipeline hasta que termina
+    ids = []
+    while True:
+        resultado = pipeline.obtenerResultado(timeout=5)
+        if resultado is None:
+            return ids
+        ids.append(resultado.id)
+
+
+def test_pipeline_termina_al_agotarse_la_fuente():
+    pipeline = pdm.pipelineDeManos(DetectorFalso(), FuenteFalsa(10), tamCola=20).iniciar()
+
+    assert resultadosPipeline(pipeline) == list(range(10))
+    pipeline.detener()
+    assert not any(hilo.is_alive() for hilo in pipeline._hilos)
+    assert pipeline.descartados() == {'captura': 0, 'inferencia': 0, 'marcadores': 0, 'pintado': 0}
+
+
+def test_pipeline_detener_con_fuente_infinita():
+    pipeline = pdm.pipelineDeManos(DetectorFalso(), FuenteFalsa()).iniciar()
+    assert pipeline.obtenerResultado(timeout=5) is not None
+
+    pipeline.detener()
+    # Las etapas vacían sus colas y el pipeline entrega None en lugar de quedarse esperando
+    ids = resultadosPipeline(pipeline)
+    assert ids == sorted(ids)
+    assert not any(hilo.is_alive() for hilo in pipeline._hilos)
+
+
+def test_pipeline_relanza_el_error_de_una_etapa():
+    fuente = FuenteFalsa()
+    pipeline = pdm.pipelineDeManos(DetectorFalso(ValueError('sin modelo'), fallo=3), fuente, tamCola=20).iniciar()
+
+    with pytest.raises(ValueError, match='sin modelo'):
+        resultadosPipeline(pipeline)
+    pipeline.detener()
+    # El fallo para también la captura
+    assert not any(hilo.is_alive() for hilo in pipeline._hilos)
+    leidos = fuente.leidos
+    time.sleep(0.05)
+    assert fuente.leidos == leidos
+
+
+class ManoFalsa():
+    # Marcadores de una mano como los de MediaPipe: el planificador copia la mano con type(mano)() y CopyFrom()
+    def __init__(self, coordenadas=()):
+        self.landmark = [SimpleNamespace(x=x, y=y, z=z) for x, y, z in coordenadas]
+
+    def CopyFrom(self, otra):
+        self.landmark = [SimpleNamespace(**vars(landmark)) for landmark in otra.landmark]
+
+
+class DetectorLento():
+    # inferirManos() tarda espera segundos y devuelve siempre las mismas manos
+    def __init__(self, espera=0.0, manos=()):
+        self.espera = espera
+        self.manos = list(manos)
+        self.inferencias = 0
+
+    def inferirManos(self, img):
+        self.inferencias += 1
+        time.sleep(self.espera)
+        return plm.resultadosManos([ManoFalsa(coordenadas) for coordenadas in self.manos] or None, None)
+
+
+def escena(desplazamiento=0):
+    # Imagen con textura (para que el flujo óptico encuentre los puntos), desplazada hacia la derecha
+    img = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    return np.roll(img, desplazamiento, axis=1)
+
+
+def test_planificador_intervalo_adaptativo():
+    img = escena()
+    # La inferencia cabe en el tiempo de un frame: se infiere en todos
+    rapido = DetectorLento()
+    planificador = plm.planificadorDeManos(rapido, fpsObjetivo=25)
+    for _ in range(5):
+        planificador.inferirManos(img)
+    assert planificador.intervalo == 1 and rapido.inferencias == 5
+
+    # 20 ms de inferencia a 200 FPS (5 ms por frame): el intervalo crece y la escena sin cambios no se infiere
+    lento = DetectorLento(espera=0.02)
+    planificador = plm.planificadorDeManos(lento, fpsObjetivo=200, intervaloMaximo=10)
+    for _ in range(20):
+        planificador.inferirManos(img)
+    assert 4 <= planificador.intervalo <= 10
+    assert lento.inferencias < 20
+    assert planificador.estadisticas()['fraccion_inferencia'] == lento.inferencias / 20
+
+
+def test_planificador_sigue_las_manos_y_vuelve_a_inferir_al_perderlas():
+    # Con un fpsObjetivo inalcanzable se sigue siempre que se pueda
+    coordenadas = [(0.3 + 0.02 * (id % 5), 0.3 + 0.02 * (id // 5), -0.01 * id) for id in range(21)]
+    detector = DetectorLento(manos=[coordenadas])
+    planificador = plm.planificadorDeManos(detector, fpsObjetivo=1e6, intervaloMaximo=10)
+
+    primero = planificador.inferirManos(escena())
+    seguido = planificador.inferirManos(escena(2))
+    assert detector.inferencias == 1
+    # La mano seguida se ha desplazado 2 píxeles en x (de 160) y conserva la z; la entregada antes no cambia
+    x = np.array([landmark.x for landmark in seguido.multi_hand_landmarks[0].landmark])
+    assert np.allclose(x, [c[0] + 2 / 160 for c in coordenadas], atol=0.5 / 160)
+    assert [landmark.z for landmark in seguido.multi_hand_landmarks[0].landmark] == [c[2] for c in coordenadas]
+    assert [landmark.x for landmark in primero.multi_hand_landmarks[0].landmark] == [c[0] for c in coordenadas]
+
+    # Un salto de la escena que el flujo óptico no puede seguir obliga a inferir de nuevo
+    recuperado = planificador.inferirManos(escena(60))
+    assert detector.inferencias == 2
+    assert [landmark.x for landmark in recuperado.multi_hand_landmarks[0].landmark] == [c[0] for c in coordenadas]
+
+
+def test_planificador_estadisticas():
+    planificador = plm.planificadorDeManos(DetectorLento())
+    assert planificador.estadisticas() == {'fps': None, 'inferencias_por_segundo': None,
+                                           'fraccion_inferencia': None, 'intervalo': 1}
+
+    # Tres frames en un segundo, dos con inferencia (la del primero no cuenta en el ritmo, sólo abre la ventana)
+    planificador._historial.extend([(10.0, True), (10.5, False), (11.0, True)])
+    assert planificador.estadisticas() == {'fps': 2.0, 'inferencias_por_segundo': 1.0,
+                                           'fraccion_inferencia': 2 / 3, 'intervalo': 1}